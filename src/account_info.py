@@ -1,43 +1,79 @@
-import requests
 import os
+import time
+import threading
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
 from auth_manager import SaxoAuthManager
 from logger_config import logger
+import fast_json
 
 class AccountManager:
-    def __init__(self, auth_manager=None):
+    COMMISSION_CACHE_TTL = 30 # seconds; cost estimates are static over short windows
+    FX_FEE_PCT = 0.005 # 0.5% conversion fee on notional volume
+    SLIPPAGE_PCT = 0.0005 # 5 bps safety margin on exit value
+    ACCOUNT_KEY_REDIS_KEY = "saxotrader:account_key"
+
+    def __init__(self, auth_manager=None, session=None):
         self.auth = auth_manager if auth_manager else SaxoAuthManager()
+        # Share the pooled keep-alive session with the auth manager
+        self.session = session if session else self.auth.session
         # Use generic gateway URL for simulation.
         # Live would be: https://gateway.saxobank.com/openapi
         self.base_url = os.getenv("SAXO_BASE_URL", "https://gateway.saxobank.com/sim/openapi")
+        self._accounts_url = f"{self.base_url}/port/v1/accounts/me"
+        self._cost_url = f"{self.base_url}/cs/v1/tradingconditions/cost"
         self.account_key = None
+        self.account_key_encoded = None # URL-safe form, computed once
+        self._commission_cache = {} # (uic, asset_type, price, qty) -> (cost, ts)
+        # get_commissions_batch() writes from pool threads: sweep + insert must not interleave
+        self._commission_lock = threading.Lock()
+        self._profit_fns = {} # (instr_curr, acct_curr, include_slippage) -> make_profit_fn closure
 
     def _get_headers(self):
-        token = self.auth.ensure_valid_token()
-        if not token:
+        # Auth manager caches the dict per token, so no per-request rebuild
+        headers = self.auth.get_headers()
+        if not headers:
             raise Exception("Failed to get valid access token")
-        return {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
+        return headers
+
+    def _set_account_key(self, account_key):
+        self.account_key = account_key
+        self.account_key_encoded = quote(account_key)
 
     def get_account_key(self):
         """Fetches the primary AccountKey for the user."""
         if self.account_key:
             return self.account_key
 
-        endpoint = f"{self.base_url}/port/v1/accounts/me"
+        # Survive restarts without an extra API call (shared Redis from auth)
+        redis_client = self.auth.redis_client
+        if redis_client:
+            try:
+                cached = redis_client.get(self.ACCOUNT_KEY_REDIS_KEY)
+                if cached:
+                    self._set_account_key(cached.decode('utf-8'))
+                    logger.info(f"Loaded AccountKey from Redis: {self.account_key}")
+                    return self.account_key
+            except Exception as e:
+                logger.error(f"Error loading AccountKey from Redis: {e}")
+
         try:
-            response = requests.get(endpoint, headers=self._get_headers())
+            response = self.session.get(self._accounts_url, headers=self._get_headers())
             response.raise_for_status()
-            data = response.json()
+            data = fast_json.loads(response.content)
             
             # Assuming the first account is the primary one for now
             if data.get('Data'):
                 # Many Saxo endpoints wrap lists in 'Data'
                 accounts = data['Data']
                 if accounts:
-                    self.account_key = accounts[0]['AccountKey']
+                    self._set_account_key(accounts[0]['AccountKey'])
                     logger.info(f"Retrieved AccountKey: {self.account_key}")
+                    if redis_client:
+                        try:
+                            redis_client.set(self.ACCOUNT_KEY_REDIS_KEY, self.account_key, ex=3600)
+                        except Exception as e:
+                            logger.error(f"Error saving AccountKey to Redis: {e}")
                     return self.account_key
             else:
                 # Some versions might return list directly or dict
@@ -53,13 +89,17 @@ class AccountManager:
         Calculates the estimated commission for a trade.
         Returns the Cost in AGREED ACCOUNT CURRENCY (usually implied by the API response).
         """
+        cache_key = (uic, asset_type, round(price, 2), quantity)
+        now = time.monotonic()
+        cached = self._commission_cache.get(cache_key)
+        if cached and now - cached[1] < self.COMMISSION_CACHE_TTL:
+            return cached[0]
+
         account_key = self.get_account_key()
         if not account_key:
             return 0.0
 
-        from urllib.parse import quote
-        safe_key = quote(account_key)
-        endpoint = f"{self.base_url}/cs/v1/tradingconditions/cost/{safe_key}/{uic}/{asset_type}"
+        endpoint = f"{self._cost_url}/{self.account_key_encoded}/{uic}/{asset_type}"
         
         params = {
             'Amount': quantity,
@@ -68,23 +108,52 @@ class AccountManager:
         }
 
         try:
-            response = requests.get(endpoint, headers=self._get_headers(), params=params)
+            response = self.session.get(endpoint, headers=self._get_headers(), params=params)
             response.raise_for_status()
-            data = response.json()
+            data = fast_json.loads(response.content)
             
             costs = data.get('Cost', {})
             cost_details = costs.get('Long') or costs.get('Short')
             
+            total_cost = 0.0
             if cost_details:
-                total_cost = cost_details.get('TotalCost', 0.0)
-                return float(total_cost)
+                total_cost = float(cost_details.get('TotalCost', 0.0))
             
-            return 0.0
+            self._cache_commission(cache_key, total_cost, now)
+            return total_cost
 
         except Exception as e:
             logger.error(f"Error calculating commission for UIC {uic}: {e}")
             return 0.0
 
+    def get_commissions_batch(self, items, max_workers=8):
+        """
+        Estimates commissions for many trades at once.
+        items: list of (uic, quantity, price, asset_type) tuples.
+        Returns the costs in the same order.
+        The cost endpoint is per-instrument (no multi-UIC form), so lookups
+        are fanned out concurrently instead of paying N serial round trips.
+        """
+        if not items:
+            return []
+        if len(items) == 1:
+            return [self.get_commissions(*items[0])]
+
+        # Resolve the AccountKey once so workers don't race the fetch
+        self.get_account_key()
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+            return list(pool.map(lambda item: self.get_commissions(*item), items))
+
+    def _cache_commission(self, cache_key, cost, now):
+        """Stores a commission estimate, evicting expired entries as the cache grows."""
+        with self._commission_lock:
+            if len(self._commission_cache) >= 1024:
+                self._commission_cache = {
+                    k: v for k, v in self._commission_cache.items()
+                    if now - v[1] < self.COMMISSION_CACHE_TTL
+                }
+            self._commission_cache[cache_key] = (cost, now)
+
     def get_fx_rate(self, from_curr, to_curr):
         """
         Fetches or simulates FX rate.
@@ -122,33 +191,81 @@ class AccountManager:
         commissions_acct = self.get_commissions(uic, quantity, avg_price, asset_type)
         
         # 4. FX Friction (Hidden Fee on Notional Volume)
-        fx_cost_acct = 0.0
-        if instrument_currency != account_currency:
-            notional_entry = entry_price * quantity
-            notional_exit = exit_price * quantity
-            total_volume_instr = notional_entry + notional_exit
-            
-            # Conversion Fee 0.5% (0.005)
-            fx_fee_pct = 0.005 
-            fx_cost_acct = (total_volume_instr * fx_rate) * fx_fee_pct
+        # Conversion Fee 0.5% on entry + exit notional, masked to 0 when no conversion
+        curr_mult = 0.0 if instrument_currency == account_currency else 1.0
+        total_volume_instr = (entry_price + exit_price) * quantity
+        fx_cost_acct = total_volume_instr * fx_rate * self.FX_FEE_PCT * curr_mult
 
         # 5. Slippage Buffer (Virtual Cost for Decision Making)
         slippage_cost_acct = 0.0
         if include_slippage:
             # 5 basis points (0.0005) on the Exit Value
-            slippage_bps = 0.0005
             exit_value_acct = (exit_price * quantity) * fx_rate
-            slippage_cost_acct = exit_value_acct * slippage_bps
+            slippage_cost_acct = exit_value_acct * self.SLIPPAGE_PCT
         
         # Total Deductions
         total_costs = commissions_acct + fx_cost_acct + slippage_cost_acct
         
         net_profit = gross_pnl_acct - total_costs
         
-        logger.info(f"Profit Audit UIC {uic}: Gross({gross_pnl_acct:.2f}) - Comm({commissions_acct:.2f}) - FX({fx_cost_acct:.2f}) - Slip({slippage_cost_acct:.2f}) = Net({net_profit:.2f}) {account_currency}")
+        logger.info("Profit Audit UIC %s: Gross(%.2f) - Comm(%.2f) - FX(%.2f) - Slip(%.2f) = Net(%.2f) %s",
+                    uic, gross_pnl_acct, commissions_acct, fx_cost_acct, slippage_cost_acct, net_profit, account_currency)
         
         return net_profit
 
+    def calculate_net_profit_batch(self, trades, asset_type="Stock", 
+                                 instrument_currency="USD", account_currency="EUR", 
+                                 include_slippage=False):
+        """
+        Batched version of calculate_net_profit for portfolio-wide audits.
+        trades: iterable of (entry_price, exit_price, quantity, uic) tuples.
+        Returns a list of Net Profits (Acct Currency) in the same order.
+        """
+        # Loop invariants are bound once in the specialised closure
+        profit = self.make_profit_fn(instrument_currency, account_currency, include_slippage)
+        
+        trades = list(trades)
+        commissions = self.get_commissions_batch([
+            (uic, quantity, (entry_price + exit_price) / 2, asset_type)
+            for entry_price, exit_price, quantity, uic in trades
+        ])
+        
+        results = [
+            profit(entry_price, exit_price, quantity, commissions_acct)
+            for (entry_price, exit_price, quantity, uic), commissions_acct in zip(trades, commissions)
+        ]
+        
+        logger.info("Profit Audit Batch: %d trades, Total Net(%.2f) %s", len(results), sum(results), account_currency)
+        return results
+
+    def make_profit_fn(self, instrument_currency="USD", account_currency="EUR", include_slippage=False):
+        """
+        Returns a specialised profit(entry_price, exit_price, quantity, commissions_acct)
+        for one currency pair, with the FX rate, FX fee and slippage factors bound
+        as closure constants. Same math as calculate_net_profit, minus the logging
+        and per-call FX lookups; commissions are passed in by the caller.
+        Cached per (instrument_currency, account_currency, include_slippage).
+        """
+        key = (instrument_currency, account_currency, include_slippage)
+        cache = self._profit_fns
+        fn = cache.get(key)
+        if fn is not None:
+            return fn
+
+        fx_rate = self.get_fx_rate(instrument_currency, account_currency)
+        curr_mult = 0.0 if instrument_currency == account_currency else 1.0
+        fx_fee = self.FX_FEE_PCT * fx_rate * curr_mult
+        slip = self.SLIPPAGE_PCT * fx_rate if include_slippage else 0.0
+
+        def profit(entry_price, exit_price, quantity, commissions_acct):
+            gross_pnl_acct = (exit_price - entry_price) * quantity * fx_rate
+            fx_cost_acct = (entry_price + exit_price) * quantity * fx_fee
+            slippage_cost_acct = exit_price * quantity * slip
+            return gross_pnl_acct - commissions_acct - fx_cost_acct - slippage_cost_acct
+
+        cache[key] = profit
+        return profit
+
     def calculate_breakeven_move(self, entry_price, quantity, uic, asset_type="Stock", 
                                instrument_currency="USD", account_currency="EUR"):
         """
@@ -160,11 +277,10 @@ class AccountManager:
         # Estimate Fixed Costs (Commissions)
         commissions_acct = self.get_commissions(uic, quantity, entry_price, asset_type)
         
-        # Estimate FX Costs (Round Trip)
-        fx_cost_acct = 0.0
-        if instrument_currency != account_currency:
-            notional_round_trip = (entry_price * quantity) * 2
-            fx_cost_acct = (notional_round_trip * fx_rate) * 0.005
+        # Estimate FX Costs (Round Trip), masked to 0 when no conversion
+        curr_mult = 0.0 if instrument_currency == account_currency else 1.0
+        notional_round_trip = (entry_price * quantity) * 2
+        fx_cost_acct = notional_round_trip * fx_rate * self.FX_FEE_PCT * curr_mult
             
         total_cost_acct = commissions_acct + fx_cost_acct
         
@@ -184,12 +300,16 @@ class AccountManager:
         # Hardcoded Acct Currency for now
         acct_curr = "EUR" 
         
-        net = self.calculate_net_profit(
-            entry_price, current_price, quantity, uic, 
-            instrument_currency=instrument_currency, 
-            account_currency=acct_curr,
-            include_slippage=True # STRICT MODE
-        )
+        # STRICT MODE (slippage included), via the per-currency specialised closure
+        profit = self.make_profit_fn(instrument_currency, acct_curr, include_slippage=True)
+        avg_price = (entry_price + current_price) / 2
+        commissions_acct = self.get_commissions(uic, quantity, avg_price)
+        net = profit(entry_price, current_price, quantity, commissions_acct)
+        
+        # Same audit trail as calculate_net_profit; FX friction and slippage are folded into one term
+        gross = (current_price - entry_price) * quantity * self.get_fx_rate(instrument_currency, acct_curr)
+        logger.info("Profit Audit UIC %s: Gross(%.2f) - Comm(%.2f) - FX+Slip(%.2f) = Net(%.2f) %s",
+                    uic, gross, commissions_acct, gross - commissions_acct - net, net, acct_curr)
         
         return net > 0
 
@@ -1,17 +1,24 @@
 import os
-import requests
-import datetime
+import time
 import redis
 from urllib.parse import urlencode
 from dotenv import load_dotenv, set_key
 from logger_config import logger
+import fast_json
+from http_client import get_shared_session, DEFAULT_TIMEOUT
 
 # Load environment variables
 load_dotenv()
 
 class SaxoAuthManager:
-    def __init__(self, env_path='.env'):
+    REFRESH_TOKEN_CHANNEL = "saxotrader:refresh_updated"
+    REFRESH_RELOAD_INTERVAL = 5.0 # seconds before cached refresh token is re-read from Redis
+    # Must outlive the token POST it guards (connect + read timeout), or a second worker gets in mid-request
+    REFRESH_LOCK_TTL = sum(DEFAULT_TIMEOUT) + 3
+
+    def __init__(self, env_path='.env', session=None):
         self.env_path = env_path
+        self.session = session if session else get_shared_session()
         self.app_key = os.getenv('APP_KEY')
         self.app_secret = os.getenv('APP_SECRET')
         self.auth_endpoint = os.getenv('AUTH_ENDPOINT')
@@ -19,7 +26,9 @@ class SaxoAuthManager:
         self.redirect_url = os.getenv('REDIRECT_URL')
         
         self.access_token = None
-        self.token_expiry = None
+        self.token_expiry = None # time.monotonic() deadline
+        self._auth_header_value = None # "Bearer <token>", formatted once per token
+        self._cached_headers = None # Rebuilt only when a new token arrives
         
         # --- Redis Integration for Token Persistence ---
         self.redis_client = None
@@ -34,8 +43,27 @@ class SaxoAuthManager:
                 self.redis_client = None
 
         # Load Refresh Token (Priority: Redis > Env)
+        self._refresh_loaded_at = time.monotonic()
         self.refresh_token = self._load_refresh_token()
         
+        # Other workers publish rotations, so we rarely need to poll Redis
+        self._pubsub_thread = None
+        if self.redis_client:
+            try:
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{self.REFRESH_TOKEN_CHANNEL: self._on_refresh_token_published})
+                self._pubsub_thread = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+            except Exception as e:
+                logger.error(f"Failed to subscribe to refresh token updates: {e}")
+        
+    def _on_refresh_token_published(self, message):
+        """Pub/Sub callback: another worker rotated the refresh token."""
+        token = message['data'].decode('utf-8')
+        if token != self.refresh_token:
+            logger.info("Received rotated Refresh Token via Redis Pub/Sub.")
+            self.refresh_token = token
+        self._refresh_loaded_at = time.monotonic()
+
     def _load_refresh_token(self):
         """Loads refresh token from Redis or falls back to Environment."""
         token = None
@@ -46,6 +74,7 @@ class SaxoAuthManager:
                 msg = self.redis_client.get("saxotrader:refresh_token")
                 if msg:
                     token = msg.decode('utf-8')
+                    self._refresh_loaded_at = time.monotonic()
                     logger.info("Loaded Refresh Token from Redis.")
             except Exception as e:
                 logger.error(f"Error loading token from Redis: {e}")
@@ -59,24 +88,30 @@ class SaxoAuthManager:
         return token
 
     def _save_refresh_token(self, token):
-        """Saves refresh token to Redis and .env."""
+        """Saves refresh token to Redis and .env (write-through only on change)."""
+        if token == self.refresh_token:
+            return
         self.refresh_token = token
         
         # 1. Save to Redis
         if self.redis_client:
             try:
                 self.redis_client.set("saxotrader:refresh_token", token)
+                self.redis_client.publish(self.REFRESH_TOKEN_CHANNEL, token)
+                self._refresh_loaded_at = time.monotonic()
                 logger.info("Saved new Refresh Token to Redis.")
             except Exception as e:
                 logger.error(f"Error saving token to Redis: {e}")
         
         # 2. Save to .env (Local Backup)
-        try:
-            os.environ['REFRESH_TOKEN'] = token 
-            if os.path.exists(self.env_path):
-                set_key(self.env_path, "REFRESH_TOKEN", token)
-        except Exception as e:
-            logger.warning(f"Could not update .env file: {e}")
+        # Redis is the source of truth when present; skip the full-file rewrite
+        os.environ['REFRESH_TOKEN'] = token 
+        if self.redis_client is None:
+            try:
+                if os.path.exists(self.env_path):
+                    set_key(self.env_path, "REFRESH_TOKEN", token)
+            except Exception as e:
+                logger.warning(f"Could not update .env file: {e}")
 
     def get_login_url(self, state='init'):
         """Generates the URL for the user to authorize the app."""
@@ -101,29 +136,58 @@ class SaxoAuthManager:
 
     def refresh_access_token(self):
         """Refreshes the access token using the stored refresh token."""
-        if not self.refresh_token:
-            logger.error("No refresh token available. Please login first.")
-            return False
+        # Refresh tokens rotate, so only one worker may spend the current one
+        lock = None
+        if self.redis_client:
+            try:
+                lock = self.redis_client.lock("saxotrader:refresh_lock", timeout=self.REFRESH_LOCK_TTL, blocking_timeout=5)
+                if lock.acquire():
+                    # Another worker may have rotated the token while we waited
+                    stored = self._load_refresh_token()
+                    if stored:
+                        self.refresh_token = stored
+                else:
+                    # The holder may be spending our refresh token right now: pick up its
+                    # rotation and let the caller retry next cycle instead of racing it
+                    logger.warning("Could not acquire refresh lock. Skipping refresh this cycle.")
+                    stored = self._load_refresh_token()
+                    if stored:
+                        self.refresh_token = stored
+                    return False
+            except Exception as e:
+                logger.error(f"Error acquiring refresh lock from Redis: {e}")
+                lock = None
 
-        data = {
-            'grant_type': 'refresh_token',
-            'refresh_token': self.refresh_token,
-            'client_id': self.app_key,
-            'client_secret': self.app_secret
-        }
-        return self._request_token(data)
+        try:
+            if not self.refresh_token:
+                logger.error("No refresh token available. Please login first.")
+                return False
+
+            data = {
+                'grant_type': 'refresh_token',
+                'refresh_token': self.refresh_token,
+                'client_id': self.app_key,
+                'client_secret': self.app_secret
+            }
+            return self._request_token(data)
+        finally:
+            if lock:
+                try:
+                    lock.release()
+                except Exception:
+                    pass # Expired under us; TTL already freed it
 
     def _request_token(self, data):
         """Helper to make the token request and update state."""
         try:
-            response = requests.post(self.token_endpoint, data=data)
+            response = self.session.post(self.token_endpoint, data=data)
             
             # Better Error Logging for HTML responses
             if not response.ok:
                 logger.error(f"Token Request Failed: {response.status_code}")
                 try:
                     # Attempt to parse and redact
-                    err_data = response.json()
+                    err_data = fast_json.loads(response.content)
                     # Redact potential sensitive keys
                     for key in ['access_token', 'refresh_token', 'client_secret']:
                         if key in err_data:
@@ -136,9 +200,9 @@ class SaxoAuthManager:
                     logger.error(f"Response Body (First 200 chars): {safe_text}...")
                 return False
 
-            token_data = response.json()
+            token_data = fast_json.loads(response.content)
 
-            self.access_token = token_data.get('access_token')
+            self._set_access_token(token_data.get('access_token'))
             expires_in = token_data.get('expires_in') # Seconds
             
             # Update Refresh Token if returned (It rotates!)
@@ -148,7 +212,7 @@ class SaxoAuthManager:
             
             # Calculate expiry time (subtract a buffer, e.g., 60 seconds)
             if expires_in:
-                self.token_expiry = datetime.datetime.now() + datetime.timedelta(seconds=int(expires_in) - 60)
+                self.token_expiry = time.monotonic() + int(expires_in) - 60
 
             logger.info("Token retrieved successfully.")
             return True
@@ -157,22 +221,51 @@ class SaxoAuthManager:
             logger.error(f"An unexpected error occurred during token request: {e}", exc_info=True)
             return False
 
+    def needs_refresh(self):
+        """True if there is no access token or it is past its (60s-early) expiry. No I/O."""
+        return not self.access_token or (self.token_expiry is not None and time.monotonic() >= self.token_expiry)
+
+    def invalidate_token(self):
+        """Marks the cached token expired (e.g. after a 401) so the next caller refreshes it."""
+        self.token_expiry = 0.0
+
     def ensure_valid_token(self):
         """Checks if token is valid, refreshes if necessary. Returns access_token."""
-        if not self.access_token or (self.token_expiry and datetime.datetime.now() >= self.token_expiry):
+        if self.needs_refresh():
             logger.info("Access token expired or missing. Attempting refresh...")
             
             # Reload from Redis just in case another worker refreshed it
-            current_stored = self._load_refresh_token()
-            if current_stored and current_stored != self.refresh_token:
-                logger.info("Newer refresh token found in storage. Updating...")
-                self.refresh_token = current_stored
+            # (skipped while Pub/Sub or a recent read keeps our copy fresh)
+            if time.monotonic() - self._refresh_loaded_at > self.REFRESH_RELOAD_INTERVAL:
+                current_stored = self._load_refresh_token()
+                if current_stored and current_stored != self.refresh_token:
+                    logger.info("Newer refresh token found in storage. Updating...")
+                    self.refresh_token = current_stored
 
             if not self.refresh_access_token():
                 logger.error("Failed to refresh token. Manual login required.")
                 return None
         return self.access_token
 
+    def _set_access_token(self, token):
+        """Stores a new access token and pre-formats the headers derived from it."""
+        self.access_token = token
+        self._auth_header_value = f"Bearer {token}"
+        self._cached_headers = {
+            "Authorization": self._auth_header_value,
+            "Content-Type": "application/json"
+        }
+
+    def get_headers(self):
+        """Returns the cached REST headers for the current token, or None if auth failed."""
+        # Fast path: token still fresh, skip the full ensure_valid_token check
+        expiry = self.token_expiry
+        if self._cached_headers is not None and (expiry is None or time.monotonic() < expiry):
+            return self._cached_headers
+        if not self.ensure_valid_token():
+            return None
+        return self._cached_headers
+
 if __name__ == "__main__":
     # Simple test execution
     auth = SaxoAuthManager()
@@ -1,33 +1,46 @@
-from flask import Flask, request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
 from auth_manager import SaxoAuthManager
 import threading
-import time
 
-import os
-
-app = Flask(__name__)
 auth_manager = SaxoAuthManager()
 
-@app.route('/callback')
-def callback():
-    code = request.args.get('code')
-    state = request.args.get('state')
-    
-    if code:
-        if auth_manager.exchange_code(code):
-            def shutdown():
-                time.sleep(3)
+class CallbackHandler(BaseHTTPRequestHandler):
+    """One-shot OAuth redirect handler: exchanges the code, then stops the server."""
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path != '/callback':
+            self._respond(404, "Not found.")
+            return
+
+        code = parse_qs(parsed.query).get('code', [None])[0]
+
+        if code:
+            if auth_manager.exchange_code(code):
+                self._respond(200, "Authentication successful! You can close this window. The script will exit shortly.")
                 print("Authentication successful. Shutting down server...")
-                os._exit(0)
-            
-            threading.Thread(target=shutdown).start()
-            return "Authentication successful! You can close this window. The script will exit shortly."
-        else:
-            return "Authentication failed.", 400
-    return "No code received.", 400
-
-def run_server():
-    app.run(port=5000)
+                # shutdown() waits for serve_forever to return, so it can't run on this thread
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+            else:
+                self._respond(400, "Authentication failed.")
+            return
+        self._respond(400, "No code received.")
+
+    def _respond(self, status, message):
+        body = message.encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def run_server(port=5000):
+    server = ThreadingHTTPServer(('127.0.0.1', port), CallbackHandler)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
 
 if __name__ == "__main__":
     print(f"Please visit this URL to login: {auth_manager.get_login_url()}")
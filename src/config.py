@@ -0,0 +1,10 @@
+"""
+Bot-wide trading configuration, shared by the orchestrator and tooling.
+"""
+import os
+
+UICS_TO_TRADE = [211] # Apple default
+STARTING_CASH_DKK = 500
+TRADE_QUANTITY = None # Dynamic based on cash
+SIMULATION_MODE = True
+REDIS_URL = os.getenv('REDIS_URL')
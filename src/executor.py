@@ -1,25 +1,62 @@
-import json
 import time
+import logging
+import threading
+import random
+import requests
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from logger_config import logger
+from http_client import DEFAULT_TIMEOUT, parse_retry_after
+import fast_json
 
 class RateLimiter:
+    # All timestamps are time.monotonic(): NTP/wall-clock jumps can't shrink or extend the window
+    BACKOFF_CAP = 300 # seconds; ceiling for exponential 429 backoff without Retry-After
     def __init__(self, limit=110, window=60): # 110 to be safe (limit is 120)
         self.limit = limit
         self.window = window
         self.calls = deque()
         self.cooldown_until = 0
+        self._consecutive_429 = 0 # reset by note_success()
+        # Shared by the executor and the scanner threads: check-and-record must be atomic
+        self._lock = threading.Lock()
 
     def add_call(self):
         """Records a new API call timestamp."""
-        self.calls.append(time.time())
-        self._cleanup()
+        with self._lock:
+            now = time.monotonic()
+            self.calls.append(now)
+            self._cleanup(now)
 
-    def _cleanup(self):
+    def _cleanup(self, now):
         """Removes calls older than the window."""
-        now = time.time()
-        while self.calls and now - self.calls[0] > self.window:
-            self.calls.popleft()
+        cutoff = now - self.window
+        calls = self.calls
+        while calls and calls[0] < cutoff:
+            calls.popleft()
+
+    def remaining_capacity(self):
+        """Number of calls still allowed in the current window (0 during a 429 cooldown)."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self.cooldown_until:
+                return 0
+            self._cleanup(now)
+            return max(0, self.limit - len(self.calls))
+
+    def reserve(self, priority='normal'):
+        """
+        Atomically checks the limit and records the call if allowed, so concurrent
+        callers can't all pass the check before any of them records.
+        Same priority rules as can_proceed().
+        Returns: True if a slot was reserved, False if blocked.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not self._allowed(now, priority):
+                return False
+            self.calls.append(now)
+            return True
 
     def can_proceed(self, priority='normal'):
         """
@@ -27,8 +64,11 @@ class RateLimiter:
         priority: 'normal' or 'high' (e.g. 'Sell').
         Returns: True if allowed, False if blocked.
         """
-        now = time.time()
-        
+        with self._lock:
+            return self._allowed(time.monotonic(), priority)
+
+    def _allowed(self, now, priority):
+        """Limit check shared by can_proceed() and reserve(). Caller holds the lock."""
         # 1. Hard Cooldown (429 Block)
         if now < self.cooldown_until:
              # Even High Priority is blocked during strict 429 backoff usually, 
@@ -36,12 +76,12 @@ class RateLimiter:
              # User said: "Never delay a Sell order due to rate limits".
              # Interpretation: Don't delay due to *internal counter*, but if Saxo says 429, we MUST wait.
              if priority == 'high':
-                 logger.warning(f"RateLimiter: Attempting HIGH priority order despite cooldown ({self.cooldown_until - now:.1f}s remaining).")
+                 logger.warning("RateLimiter: Attempting HIGH priority order despite cooldown (%.1fs remaining).", self.cooldown_until - now)
                  return True
              return False
 
         # 2. Rate Limit Logic
-        self._cleanup()
+        self._cleanup(now)
         if len(self.calls) >= self.limit:
             if priority == 'high':
                 logger.warning("RateLimiter: Limit reached, but proceeding with HIGH priority order.")
@@ -50,17 +90,42 @@ class RateLimiter:
             
         return True
 
-    def trigger_cooldown(self, seconds=60):
-        """Activates backup due to 429."""
-        self.cooldown_until = time.time() + seconds
-        logger.warning(f"RateLimiter: Cooldown activated for {seconds}s.")
+    def trigger_cooldown(self, seconds=None):
+        """
+        Activates backoff due to 429.
+        seconds: the server's Retry-After, if any. Without it, backs off
+        exponentially with full jitter on consecutive 429s, so the scanner and
+        executor don't all retry in lockstep.
+        """
+        with self._lock:
+            if seconds is None:
+                seconds = min(self.BACKOFF_CAP, 2 ** self._consecutive_429) + random.uniform(0, 1.0)
+            self._consecutive_429 += 1
+            self.cooldown_until = time.monotonic() + seconds
+        logger.warning("RateLimiter: Cooldown activated for %.1fs.", seconds)
+
+    def note_success(self):
+        """Resets the 429 backoff after a successful call."""
+        with self._lock:
+            self._consecutive_429 = 0
 
 class OrderExecutor:
-    def __init__(self, account_manager, dry_run=True, rate_limiter=None):
+    # Concurrent requests used when fanning out kill-switch cancels/closes
+    KILL_SWITCH_WORKERS = 16
+
+    def __init__(self, account_manager, dry_run=True, rate_limiter=None, session=None):
         self.account = account_manager
         self.dry_run = dry_run
         self.base_url = account_manager.base_url # Re-use base URL from account manager
+        self.session = session if session else account_manager.session # Re-use pooled connections
+        
+        # Endpoints are fixed per base URL: build them once
+        self._orders_url = f"{self.base_url}/trade/v1/orders"
+        self._positions_url = f"{self.base_url}/port/v1/positions"
+        self._order_payload_tmpl = None # Built once the AccountKey is known
         self.rate_limiter = rate_limiter
+        # Bounded per call so a hung endpoint can't pin a worker or a rate-limit slot
+        self.timeout = DEFAULT_TIMEOUT
         
         if self.dry_run:
             logger.warning("EXECUTOR IS IN SIMULATION MODE (DRY RUN). NO REAL TRADES WILL BE PLACED.")
@@ -68,16 +133,31 @@ class OrderExecutor:
     def _get_headers(self):
         return self.account._get_headers() # Reuse auth headers logic
 
-    def place_order(self, uic, amount, action='Buy', order_type='Market', price=None, asset_type='Stock'):
+    def _get_order_payload_template(self, account_key):
+        """Returns the invariant part of every order payload for this account."""
+        tmpl = self._order_payload_tmpl
+        if tmpl is None or tmpl["AccountKey"] != account_key:
+            tmpl = {
+                "OrderDuration": {"DurationType": "DayOrder"},
+                "AccountKey": account_key
+            }
+            self._order_payload_tmpl = tmpl
+        return tmpl
+
+    def place_order(self, uic, amount, action='Buy', order_type='Market', price=None, asset_type='Stock',
+                    priority=None):
         """
         Places an order.
         action: 'Buy' or 'Sell'
+        priority: rate-limiter priority; defaults to 'high' for Sells, 'normal' otherwise.
         """
         # 0. Rate Limiter Check
         if self.rate_limiter:
-            priority = 'high' if action == 'Sell' else 'normal'
-            if not self.rate_limiter.can_proceed(priority):
-                logger.warning(f"Order skipped due to Rate Limit ({action} {uic})")
+            if priority is None:
+                priority = 'high' if action == 'Sell' else 'normal'
+            # Reserve the slot up front: the call is counted whether or not it succeeds
+            if not self.rate_limiter.reserve(priority):
+                logger.warning("Order skipped due to Rate Limit (%s %s)", action, uic)
                 return False
 
         account_key = self.account.get_account_key()
@@ -85,14 +165,13 @@ class OrderExecutor:
             logger.error("Cannot place order: No AccountKey found.")
             return False
 
-        # Construct Order Payload
+        # Construct Order Payload from the per-account skeleton
         payload = {
+            **self._get_order_payload_template(account_key),
             "Uic": uic,
             "AssetType": asset_type,
             "Amount": amount,
             "BuySell": action,
-            "OrderDuration": {"DurationType": "DayOrder"},
-            "AccountKey": account_key,
             "OrderType": order_type
         }
         
@@ -103,98 +182,72 @@ class OrderExecutor:
             payload['OrderPrice'] = price
 
         if self.dry_run:
-            logger.info(f"[SIMULATION] would place order: {json.dumps(payload, indent=2)}")
-            # In Sim, we still tick the limiter to simulate load? Yes.
-            if self.rate_limiter: self.rate_limiter.add_call()
+            # Pretty-printing is the costly part: only do it if the record will be emitted
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("[SIMULATION] would place order: %s", fast_json.dumps(payload, indent=True).decode())
             return True # Pretend success
 
         # Real Execution
-        endpoint = f"{self.base_url}/trade/v1/orders"
         try:
-            response = requests.post(endpoint, headers=self._get_headers(), json=payload)
-            
-            # Post-call: Count it
-            if self.rate_limiter: self.rate_limiter.add_call()
+            # Pre-encoded body (orjson when available); auth headers already carry Content-Type
+            response = self.session.post(self._orders_url, headers=self._get_headers(), data=fast_json.dumps(payload),
+                                         timeout=self.timeout, allow_redirects=False)
 
             # Handle 429 specifically
             if response.status_code == 429:
-                retry_after = int(response.headers.get("Retry-After", 60))
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
                 if self.rate_limiter: self.rate_limiter.trigger_cooldown(retry_after)
-                logger.error(f"Rate Limit 429 Hit! Backing off for {retry_after}s")
+                logger.error("Rate Limit 429 Hit! Retry-After: %s", retry_after)
                 return False
 
             response.raise_for_status()
-            data = response.json()
-            logger.info(f"Order placed successfully. OrderId: {data.get('OrderId')}")
+            if self.rate_limiter: self.rate_limiter.note_success()
+            data = fast_json.loads(response.content)
+            logger.info("Order placed successfully. OrderId: %s", data.get('OrderId'))
             return True
+        except requests.exceptions.Timeout as e:
+            # Client-side timeout is not a 429: no cooldown. The order may still have reached Saxo.
+            logger.error("Order request timed out, state unknown (%s %s): %s", action, uic, e)
+            return False
         except Exception as e:
-            logger.error(f"Failed to place order: {e}")
+            logger.error("Failed to place order: %s", e)
             if hasattr(e, 'response') and e.response is not None:
-                logger.error(f"Response: {e.response.text}")
+                logger.error("Response: %s", e.response.text)
             return False
 
-    def cancel_all_orders(self):
-        """Cancels all open orders."""
-        if self.dry_run:
-            logger.info("[SIMULATION] would CANCEL ALL open orders.")
-            return
-
-        logger.warning("KILL SWITCH: Attempting to cancel all open orders...")
-        
-        # 1. Fetch Open Orders
+    def _iter_open_order_ids(self, account_key):
+        """Streams the OrderIds of all open orders. Raises on HTTP errors."""
         # Endpoint: /trade/v1/orders?FieldGroups=DisplayAndFormat&ClientKey=...
         # We'll just fetch for the account
-        account_key = self.account.get_account_key()
-        endpoint = f"{self.base_url}/trade/v1/orders"
         params = {
             'AccountKey': account_key,
             'FieldGroups': 'DisplayAndFormat'
         }
-        
-        try:
-            resp = requests.get(endpoint, headers=self._get_headers(), params=params)
+        if self.rate_limiter: self.rate_limiter.reserve('high') # Kill-switch path: counted, never blocked
+        resp = self.session.get(self._orders_url, headers=self._get_headers(), params=params, stream=True,
+                                timeout=self.timeout, allow_redirects=False)
+        with resp:
             resp.raise_for_status()
-            orders = resp.json().get('Data', [])
-            
-            for order in orders:
+            for order in fast_json.iter_items(resp, 'Data.item'):
                 order_id = order.get('OrderId')
                 if order_id:
-                    self._cancel_single_order(order_id, account_key)
-                    
-        except Exception as e:
-            logger.error(f"Error fetching orders for cancellation: {e}")
+                    yield order_id
 
-    def _cancel_single_order(self, order_id, account_key):
-        delete_endpoint = f"{self.base_url}/trade/v1/orders/{order_id}?AccountKey={account_key}"
-        try:
-            resp = requests.delete(delete_endpoint, headers=self._get_headers())
-            resp.raise_for_status()
-            logger.info(f"Cancelled Order {order_id}")
-        except Exception as e:
-            logger.error(f"Failed to cancel order {order_id}: {e}")
-
-    def close_all_positions(self):
-        """Closes all open positions at Market Price."""
-        if self.dry_run:
-            logger.info("[SIMULATION] would CLOSE ALL positions.")
-            return
-
-        logger.warning("KILL SWITCH: Attempting to close all positions...")
-        
-        account_key = self.account.get_account_key()
-        # Fetch Positions
-        endpoint = f"{self.base_url}/port/v1/positions"
+    def _iter_closing_orders(self, account_key):
+        """
+        Streams open positions and yields the opposing orders that flatten them,
+        as (uic, amount, action, asset_type) tuples. Raises on HTTP errors.
+        """
         params = {
             'AccountKey': account_key,
             'FieldGroups': 'DisplayAndFormat,PositionBase' 
         }
-        
-        try:
-            resp = requests.get(endpoint, headers=self._get_headers(), params=params)
+        if self.rate_limiter: self.rate_limiter.reserve('high') # Kill-switch path: counted, never blocked
+        resp = self.session.get(self._positions_url, headers=self._get_headers(), params=params, stream=True,
+                                timeout=self.timeout, allow_redirects=False)
+        with resp:
             resp.raise_for_status()
-            positions = resp.json().get('Data', [])
-            
-            for pos in positions:
+            for pos in fast_json.iter_items(resp, 'Data.item'):
                 # To close, we place an opposing order
                 position_base = pos.get('PositionBase', {})
                 uic = position_base.get('Uic')
@@ -207,19 +260,97 @@ class OrderExecutor:
                 action = 'Sell' if amount > 0 else 'Buy'
                 abs_amount = abs(amount)
                 
-                logger.info(f"Closing position UIC {uic} ({amount}): {action} {abs_amount}")
-                
-                # Careful: Close-All implies market order usually
-                self.place_order(uic, abs_amount, action=action, order_type='Market', asset_type=asset_type)
-                
+                logger.info("Closing position UIC %s (%s): %s %s", uic, amount, action, abs_amount)
+                yield (uic, abs_amount, action, asset_type)
+
+    def _close_position(self, closing_order):
+        uic, amount, action, asset_type = closing_order
+        # Careful: Close-All implies market order usually
+        # Flattening a short is a Buy, but it is just as urgent as a Sell
+        return self.place_order(uic, amount, action=action, order_type='Market', asset_type=asset_type,
+                                priority='high')
+
+    def _dispatch_streamed(self, pool, items, action, what):
+        """
+        Submits action(item) to the pool as soon as each item is parsed,
+        so the first cancel/close goes out before the whole list is read.
+        Returns the submitted futures.
+        """
+        futures = []
+        try:
+            for item in items:
+                futures.append(pool.submit(action, item))
+        except Exception as e:
+            logger.error("Error fetching %s: %s", what, e)
+        return futures
+
+    def cancel_all_orders(self):
+        """Cancels all open orders."""
+        if self.dry_run:
+            logger.info("[SIMULATION] would CANCEL ALL open orders.")
+            return
+
+        logger.warning("KILL SWITCH: Attempting to cancel all open orders...")
+        account_key = self.account.get_account_key()
+        
+        # Fan out the DELETEs concurrently (I/O bound, pooled session)
+        with ThreadPoolExecutor(max_workers=self.KILL_SWITCH_WORKERS) as pool:
+            self._dispatch_streamed(
+                pool, self._iter_open_order_ids(account_key),
+                lambda oid: self._cancel_single_order(oid, account_key), "orders for cancellation"
+            )
+
+    def _cancel_single_order(self, order_id, account_key):
+        # Cancels are risk-reducing: 'high' never blocks, but keeps the window count honest
+        if self.rate_limiter: self.rate_limiter.reserve('high')
+        try:
+            resp = self.session.delete(f"{self._orders_url}/{order_id}", headers=self._get_headers(),
+                                       params={'AccountKey': account_key},
+                                       timeout=self.timeout, allow_redirects=False)
+            resp.raise_for_status()
+            logger.info("Cancelled Order %s", order_id)
         except Exception as e:
-            logger.error(f"Error fetching positions for closure: {e}")
+            logger.error("Failed to cancel order %s: %s", order_id, e)
+
+    def close_all_positions(self):
+        """Closes all open positions at Market Price."""
+        if self.dry_run:
+            logger.info("[SIMULATION] would CLOSE ALL positions.")
+            return
+
+        logger.warning("KILL SWITCH: Attempting to close all positions...")
+        # AccountKey is cached here, so workers don't race the lookup
+        account_key = self.account.get_account_key()
+        
+        with ThreadPoolExecutor(max_workers=self.KILL_SWITCH_WORKERS) as pool:
+            self._dispatch_streamed(
+                pool, self._iter_closing_orders(account_key),
+                self._close_position, "positions for closure"
+            )
 
     def kill_switch(self):
         """EMERGENCY: Cancels all orders and closes all positions."""
         logger.critical("!!! KILL SWITCH ACTIVATED !!!")
-        self.cancel_all_orders()
-        self.close_all_positions()
+        if self.dry_run:
+            self.cancel_all_orders()
+            self.close_all_positions()
+            return
+
+        logger.warning("KILL SWITCH: Cancelling all open orders and closing all positions...")
+        account_key = self.account.get_account_key()
+        
+        with ThreadPoolExecutor(max_workers=self.KILL_SWITCH_WORKERS) as pool:
+            # Orders and positions are independent reads: stream both at once,
+            # each dispatcher submitting cancels/closes as items arrive
+            dispatchers = [
+                pool.submit(self._dispatch_streamed, pool, self._iter_open_order_ids(account_key),
+                            lambda oid: self._cancel_single_order(oid, account_key), "orders for cancellation"),
+                pool.submit(self._dispatch_streamed, pool, self._iter_closing_orders(account_key),
+                            self._close_position, "positions for closure"),
+            ]
+            for dispatcher in dispatchers:
+                for f in dispatcher.result():
+                    f.result()
 
 if __name__ == "__main__":
     # Test
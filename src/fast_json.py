@@ -0,0 +1,46 @@
+"""
+JSON encode/decode helpers.
+Uses orjson (C extension) when installed, falling back to the stdlib json module.
+iter_items() streams arrays with ijson when installed.
+dumps() always returns UTF-8 bytes, ready for HTTP bodies and Redis values.
+"""
+try:
+    import orjson
+
+    def loads(data):
+        return orjson.loads(data)
+
+    def dumps(obj, indent=False):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+
+except ImportError:
+    # Fallback if orjson is missing
+    import json
+
+    def loads(data):
+        return json.loads(data)
+
+    def dumps(obj, indent=False):
+        return json.dumps(obj, indent=2 if indent else None, separators=None if indent else (',', ':')).encode('utf-8')
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+def iter_items(response, prefix):
+    """
+    Yields the elements of the JSON array at `prefix` (ijson notation, e.g. 'Data.item')
+    from a requests Response. Streams with ijson when installed (request with stream=True),
+    so the first element is available before the body has fully arrived.
+    Otherwise parses the whole body.
+    """
+    if ijson is not None:
+        response.raw.decode_content = True # Let urllib3 undo gzip before parsing
+        yield from ijson.items(response.raw, prefix, use_float=True)
+        return
+
+    data = loads(response.content)
+    for key in prefix.split('.')[:-1]:
+        data = data.get(key, []) if isinstance(data, dict) else []
+    yield from data
@@ -0,0 +1,88 @@
+import time
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) seconds applied to every call unless overridden
+DEFAULT_TIMEOUT = (2, 10)
+
+_shared_session = None
+
+class CappedRetry(Retry):
+    """
+    urllib3 Retry that honours Retry-After, but never sleeps longer than
+    MAX_RETRY_AFTER inside a single call. Longer backoffs belong to the RateLimiter.
+    """
+    MAX_RETRY_AFTER = 5
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, self.MAX_RETRY_AFTER)
+
+def default_retries():
+    """
+    Transport-level retries with exponential backoff.
+    POST is deliberately excluded: retrying an order or token request after a
+    502/504 can place the same order twice or burn a rotating refresh token.
+    raise_on_status=False hands the final 429/5xx response back to the caller.
+    """
+    return CappedRetry(
+        total=5,
+        backoff_factor=0.25,
+        status_forcelist=[429, 502, 503, 504],
+        allowed_methods=frozenset(["GET", "DELETE"]),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+
+def parse_retry_after(value):
+    """
+    Parses a Retry-After header (RFC 9110: delay-seconds or an HTTP-date).
+    Returns the wait in seconds (>= 0), or None if missing/unparseable.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+class TimeoutSession(requests.Session):
+    """requests.Session that applies a default timeout to every request."""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+def build_session(pool_connections=8, pool_maxsize=32, retries=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Builds a requests.Session backed by a pooled keep-alive HTTPAdapter.
+    Reusing the session avoids a fresh TCP+TLS handshake per Saxo API call,
+    and retries reuse the pooled socket instead of reconnecting.
+    """
+    if retries is None:
+        retries = default_retries()
+
+    session = TimeoutSession(timeout=timeout)
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retries)
+    session.mount("https://", adapter)
+    session.headers['Connection'] = 'keep-alive'
+    return session
+
+def get_shared_session():
+    """Returns the process-wide Session shared by Auth, Account, Executor, MarketData and Scanner."""
+    global _shared_session
+    if _shared_session is None:
+        _shared_session = build_session()
+    return _shared_session
@@ -1,15 +1,23 @@
 import logging
 import sys
+import queue
+import atexit
+from logging.handlers import QueueHandler, QueueListener
 
 def setup_logger(name=None):
     """
     Configures a logger with the requested color scheme and format.
+    Records are handed to a QueueListener thread, so callers on the asyncio
+    loop never block on stdout writes.
     """
     logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG) 
+    # Already configured: keep its handlers (and listener thread) instead of clearing them
+    if logger.handlers:
+        return logger
     
-    if logger.hasHandlers():
-        logger.handlers.clear()
+    logger.setLevel(logging.DEBUG) 
+    # The __main__ blocks call logging.basicConfig(); don't emit everything twice via root
+    logger.propagate = False
 
     handler = logging.StreamHandler(sys.stdout)
     
@@ -37,7 +45,14 @@ def setup_logger(name=None):
         )
 
     handler.setFormatter(formatter)
-    logger.addHandler(handler)
+    
+    # Actual I/O happens on the listener thread; flushed and joined at exit
+    log_queue = queue.Queue(-1)
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    
+    logger.addHandler(QueueHandler(log_queue))
     
     return logger
 
@@ -3,14 +3,11 @@ import time
 import os
 import sys
 import signal
-import json
+import fast_json
 import redis
 import functools
 from concurrent.futures import ThreadPoolExecutor
 
-# Add src to path if needed
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-
 from logger_config import logger
 
 from auth_manager import SaxoAuthManager
@@ -20,17 +17,14 @@ from strategy import TrendFollower
 from executor import OrderExecutor, RateLimiter
 from reporting import DailyReporter
 from scanner import MarketScanner
-
-# Configuration
-UICS_TO_TRADE = [211] # Apple default
-STARTING_CASH_DKK = 500
-TRADE_QUANTITY = None # Dynamic based on cash
-SIMULATION_MODE = True
-REDIS_URL = os.getenv('REDIS_URL')
+from config import UICS_TO_TRADE, STARTING_CASH_DKK, SIMULATION_MODE, REDIS_URL
 
 class BotOrchestrator:
+    UNIVERSE_SYNC_INTERVAL = 0.5 # seconds; debounce window for Redis universe writes
+
     def __init__(self):
         self.running = True
+        self._stop = asyncio.Event() # Set by shutdown(); run() sleeps on it
         self.executor = ThreadPoolExecutor(max_workers=5)
         
         # 1. Initialize Modules
@@ -44,9 +38,6 @@ class BotOrchestrator:
         self.account = AccountManager(self.auth)
         self.market_data = MarketDataManager(self.auth)
         self.executor_module = OrderExecutor(self.account, dry_run=SIMULATION_MODE, rate_limiter=self.rate_limiter)
-        self.strategy = TrendFollower(self.account)
-        self.reporter = DailyReporter(os.path.join(os.path.dirname(__file__), '..', 'logs'), self.account)
-        self.scanner = MarketScanner(self.auth, self.market_data, rate_limiter=self.rate_limiter)
         
         # Redis Control
         self.redis = None
@@ -57,36 +48,56 @@ class BotOrchestrator:
                 logger.info("Connected to Redis for ActiveUniverse.")
             except Exception as e:
                 logger.error(f"Redis connection failed: {e}")
+                self.redis = None # Unreachable: the strategy falls back to its own connect
+
+        # Shares the connection above; positions still load synchronously, before any tick
+        self.strategy = TrendFollower(self.account, redis_client=self.redis)
+        self.reporter = DailyReporter(os.path.join(os.path.dirname(__file__), '..', 'logs'), self.account)
+        self.scanner = MarketScanner(self.auth, self.market_data, rate_limiter=self.rate_limiter)
 
         # State Tracking
-        self.last_processed_time = {} # uic -> timestamp
+        self.last_processed_seq = {} # uic -> tick Seq from MarketDataManager
+        self._sync_pending = False # Set by sync_active_universe()
 
     def sync_active_universe(self):
+        """
+        Marks the Watched/Owned lists as dirty. task_universe_sync writes them
+        to Redis at most every UNIVERSE_SYNC_INTERVAL, so bursts collapse into one write.
+        """
+        self._sync_pending = True
+
+    def _build_universe_payload(self):
+        return fast_json.dumps({
+            "watched": list(self.market_data.get_active_snapshot()),
+            "owned": list(self.strategy.active_positions.keys()),
+            "timestamp": time.time()
+        })
+
+    def _write_active_universe(self, payload):
         """Syncs Watched and Owned lists to Redis."""
-        if not self.redis: return
-        
         try:
-            watched = list(self.market_data.active_uics)
-            owned = list(self.strategy.active_positions.keys())
-            
-            payload = {
-                "watched": watched,
-                "owned": owned,
-                "timestamp": time.time()
-            }
-            self.redis.set("saxotrader:active_universe", json.dumps(payload))
+            self.redis.set("saxotrader:active_universe", payload, ex=3600)
             # logger.debug("Synced ActiveUniverse to Redis.")
         except Exception as e:
             logger.error(f"Failed to sync ActiveUniverse: {e}")
 
+    async def task_universe_sync(self):
+        """Debounced writer for sync_active_universe()."""
+        if not self.redis: return
+        loop = asyncio.get_running_loop()
+        while self.running:
+            await asyncio.sleep(self.UNIVERSE_SYNC_INTERVAL)
+            if not self._sync_pending: continue
+            self._sync_pending = False
+            # Snapshot on the loop thread (owns active_positions), write from the pool
+            payload = self._build_universe_payload()
+            await loop.run_in_executor(self.executor, self._write_active_universe, payload)
+
     def _run_scanner_cycle(self):
         """Helper to run scan and subscribe in thread pool."""
         hot_list = self.scanner.perform_market_scan()
-        for item in hot_list:
-            # item is (uic, price, asset_type)
-            uic = item[0]
-            # add_to_stream handles valid token & subscription
-            self.market_data.add_to_stream(uic)
+        # item is (uic, price, asset_type); one bulk subscription for the whole batch
+        self.market_data.subscribe_to_tickers([item[0] for item in hot_list])
         return hot_list
 
     async def task_scanner(self):
@@ -111,6 +122,13 @@ class BotOrchestrator:
             self.scanner.universe_uics = [211, 212, 111, 137]
 
         while self.running:
+            wait = self.scanner.seconds_until_open()
+            if wait > 0:
+                # Outside US session hours there are no movers to find
+                logger.info("Scanner: Market closed. Next scan in %.1fh.", wait / 3600)
+                await asyncio.sleep(wait)
+                continue
+
             try:
                 # Run sync scanner in thread pool
                 logger.info("Scanner: Starting Broad Market Scan...")
@@ -152,10 +170,11 @@ class BotOrchestrator:
                 self.sync_active_universe()
                 
                 # Ensure Anchor is actually subscribed if missing (Re-Subscribe check)
-                for uic in UICS_TO_TRADE:
-                    if uic not in self.market_data.active_uics:
-                         logger.info(f"Janitor: Re-subscribing to Anchor UIC {uic}")
-                         self.market_data.add_subscription(uic)
+                active = self.market_data.get_active_snapshot()
+                missing = [uic for uic in UICS_TO_TRADE if uic not in active]
+                if missing:
+                    logger.info(f"Janitor: Re-subscribing to Anchor UICs {missing}")
+                    await loop.run_in_executor(self.executor, self.market_data.subscribe_to_tickers, missing)
                 
                 
             except Exception as e:
@@ -167,91 +186,94 @@ class BotOrchestrator:
     async def task_stream_processor(self):
         """Task 2: The Streamer (Real-time Tick Processing)."""
         logger.info("Task [stream_processor]: Started.")
-        # This replaces the old main loop
+        # Event-driven: wakes only when the WebSocket thread publishes a tick
+        queue = self.market_data.tick_queue
         
         while self.running:
+            uic, current_price, seq = await queue.get()
+            
+            # Deduplicate ticks (integer compare; Seq is unique per update)
+            if seq == self.last_processed_seq.get(uic):
+                continue
+            
             try:
-                # Maintenance: Token Refresh
-                if not self.auth.ensure_valid_token():
-                     logger.warning("Token expired, refreshing...")
-                
-                # Process Ticks
-                # We copy active_uics to avoid thread contention issues during iteration
-                active_uics = list(self.market_data.active_uics)
-                
-                for uic in active_uics:
-                    state = self.market_data.live_market_state.get(uic)
-                    if not state: continue
-                    
-                    current_price = state.get('LastPrice')
-                    update_time = state.get('Updated')
-                    
-                    if not current_price: continue
-                    
-                    # Deduplicate ticks
-                    if update_time != self.last_processed_time.get(uic):
-                        prev_peak = self.strategy.active_positions.get(uic, {}).get('peak_price', 0)
-                        
-                        # EXECUTE STRATEGY
-                        # 1. Single Position Rule (Micro-Capital)
-                        if len(self.strategy.active_positions) >= 1 and uic not in self.strategy.active_positions:
-                            # We already found our "One True Trade". Ignore others until we sell.
-                            continue
+                self._handle_tick(uic, current_price)
+            except Exception as e:
+                logger.error("Stream Processor Error: %s", e)
+            
+            self.last_processed_seq[uic] = seq
 
-                        # 2. Dynamic Quantity Calculation
-                        # Convert DKK to USD (Approx 1 DKK = 0.145 USD)
-                        CAPITAL_LIMIT_USD = STARTING_CASH_DKK * 0.145
-                        qty = int(CAPITAL_LIMIT_USD / current_price) if current_price > 0 else 0
-                        
-                        if qty < 1 and not self.strategy.active_positions.get(uic):
-                            # Too expensive for our poor wallet
-                            continue
-                            
-                        # 3. Cost Efficiency Check (Before BUY Signal)
-                        # Estimated Cost: $2.00 (commission)
-                        # We need Potential Profit > $4.00 to justify trade
-                        # Proxy: Can a 6% move cover 2x costs?
-                        # Potential Profit from 6% move = (Price * Qty) * 0.06
-                        EST_COST = 2.0
-                        if not self.strategy.active_positions.get(uic):
-                            potential_profit = (current_price * qty) * 0.06
-                            if potential_profit < (2 * EST_COST):
-                                # Skip: Volatility/Capital too low to cover fees
-                                continue
+    def _handle_tick(self, uic, current_price):
+        """Runs the strategy for one price update and executes any resulting signal."""
+        prev_peak = self.strategy.active_positions.get(uic, {}).get('peak_price', 0)
+        
+        # EXECUTE STRATEGY
+        # 1. Single Position Rule (Micro-Capital)
+        if len(self.strategy.active_positions) >= 1 and uic not in self.strategy.active_positions:
+            # We already found our "One True Trade". Ignore others until we sell.
+            return
 
-                        signal = self.strategy.update(uic, current_price, quantity=qty)
-                        
-                        # Logging & Notification
-                        new_peak = self.strategy.active_positions.get(uic, {}).get('peak_price', 0)
-                        if new_peak > prev_peak and prev_peak > 0:
-                             logger.warning(f"PEAK DETECTED: UIC {uic} New High: {new_peak:.2f}")
+        # 2. Dynamic Quantity Calculation
+        # Convert DKK to USD (Approx 1 DKK = 0.145 USD)
+        CAPITAL_LIMIT_USD = STARTING_CASH_DKK * 0.145
+        qty = int(CAPITAL_LIMIT_USD / current_price) if current_price > 0 else 0
+        
+        if qty < 1 and not self.strategy.active_positions.get(uic):
+            # Too expensive for our poor wallet
+            return
+            
+        # 3. Cost Efficiency Check (Before BUY Signal)
+        # Estimated Cost: $2.00 (commission)
+        # We need Potential Profit > $4.00 to justify trade
+        # Proxy: Can a 6% move cover 2x costs?
+        # Potential Profit from 6% move = (Price * Qty) * 0.06
+        EST_COST = 2.0
+        if not self.strategy.active_positions.get(uic):
+            potential_profit = (current_price * qty) * 0.06
+            if potential_profit < (2 * EST_COST):
+                # Skip: Volatility/Capital too low to cover fees
+                return
 
-                        if signal:
-                            action = 'Buy' if signal == 'BUY' else 'Sell'
-                            logger.critical(f"TRADE SIGNAL: {action} {uic} @ {current_price} (Qty: {qty})")
-                            
-                            success = False
-                            if not SIMULATION_MODE:
-                                success = self.executor_module.place_order(
-                                    uic=uic, amount=qty, action=action, 
-                                    order_type='Market', asset_type='Stock'
-                                )
-                            else:
-                                self.reporter.log_simulation_trade(action, uic, current_price, "Signal")
-                                success = True
-                                
-                            if success:
-                                # Sync state on trade execution (Ownership change)
-                                self.sync_active_universe()
+        signal = self.strategy.update(uic, current_price, quantity=qty)
+        
+        # Logging & Notification
+        new_peak = self.strategy.active_positions.get(uic, {}).get('peak_price', 0)
+        if new_peak > prev_peak and prev_peak > 0:
+             logger.warning("PEAK DETECTED: UIC %s New High: %.2f", uic, new_peak)
 
-                        self.last_processed_time[uic] = update_time
-                
-                # Small sleep to yield to event loop (don't burn CPU)
-                await asyncio.sleep(0.1)
+        if signal:
+            action = 'Buy' if signal == 'BUY' else 'Sell'
+            logger.critical("TRADE SIGNAL: %s %s @ %s (Qty: %s)", action, uic, current_price, qty)
+            
+            success = False
+            if not SIMULATION_MODE:
+                success = self.executor_module.place_order(
+                    uic=uic, amount=qty, action=action, 
+                    order_type='Market', asset_type='Stock'
+                )
+            else:
+                self.reporter.log_simulation_trade(action, uic, current_price, "Signal")
+                success = True
                 
+            if success:
+                # Sync state on trade execution (Ownership change)
+                self.sync_active_universe()
+
+    async def task_token_maintenance(self):
+        """Keeps the access token fresh, independent of tick traffic."""
+        logger.info("Task [token_maintenance]: Started.")
+        loop = asyncio.get_running_loop()
+        while self.running:
+            try:
+                # Cheap local expiry check; only hop to the pool when a refresh is due
+                if self.auth.needs_refresh():
+                    # Refresh is a blocking HTTP call: keep it off the loop
+                    token = await loop.run_in_executor(self.executor, self.auth.ensure_valid_token)
+                    if not token:
+                        logger.warning("Token expired, refreshing...")
             except Exception as e:
-                logger.error(f"Stream Processor Error: {e}")
-                await asyncio.sleep(1)
+                logger.error(f"Token Maintenance Error: {e}")
+            await asyncio.sleep(5)
 
     async def task_reporting(self):
         """Periodic Health Reporting."""
@@ -260,10 +282,14 @@ class BotOrchestrator:
             self.reporter.log_health(self.strategy)
             await asyncio.sleep(60)
 
-    async def shutdown(self):
+    async def shutdown(self, sig=None):
         """Graceful Shutdown."""
-        logger.warning("Shutdown Signal Received. Saving state...")
+        if self._stop.is_set():
+            return # SIGINT + SIGTERM (or a repeated Ctrl-C) must not run this twice
+        logger.warning("Shutdown Signal Received (%s). Saving state...", sig.name if sig else "manual")
         self.running = False
+        self._stop.set()
+        self.scanner.stop() # Aborts an in-flight scan's batch pauses
         
         # Save all peak prices
         # Strategy saves incrementally, but we can verify here if needed.
@@ -272,8 +298,11 @@ class BotOrchestrator:
         for uic in self.strategy.active_positions:
             self.strategy._save_state(uic)
         
-        # Close Redis
+        # Close Redis (flushing a pending universe write first)
         if self.redis:
+            if self._sync_pending:
+                self._sync_pending = False
+                self._write_active_universe(self._build_universe_payload())
             self.redis.close()
             
         logger.info("Stopping WebSocket...")
@@ -286,6 +315,9 @@ class BotOrchestrator:
         """Main Entry Point."""
         logger.info("Starting Asyncio Orchestrator...")
         
+        # Ticks are pushed from the WebSocket thread onto this loop
+        self.market_data.attach_event_loop(asyncio.get_running_loop())
+        
         # Start WebSocket Thread (It's self-managed)
         self.market_data.start_stream(UICS_TO_TRADE)
         
@@ -293,7 +325,7 @@ class BotOrchestrator:
         try:
             loop = asyncio.get_running_loop()
             for sig in (signal.SIGINT, signal.SIGTERM):
-                loop.add_signal_handler(sig, lambda: asyncio.create_task(self.shutdown()))
+                loop.add_signal_handler(sig, lambda s=sig: asyncio.create_task(self.shutdown(s)))
         except (NotImplementedError, AttributeError):
             logger.warning("Signal handlers not supported on this platform (Windows?). Using KeyboardInterrupt fallback.")
         
@@ -302,16 +334,23 @@ class BotOrchestrator:
         t2 = asyncio.create_task(self.task_stream_processor())
         t3 = asyncio.create_task(self.task_janitor())
         t4 = asyncio.create_task(self.task_reporting())
+        t5 = asyncio.create_task(self.task_token_maintenance())
+        t6 = asyncio.create_task(self.task_universe_sync())
         
-        # Keep alive until running is False
-        while self.running:
-            await asyncio.sleep(1)
+        # Idle until shutdown() fires, no periodic wakeups
+        await self._stop.wait()
             
-        # Should cancel tasks here if we want strict cleanup
-        t1.cancel()
-        t2.cancel()
-        t3.cancel()
-        t4.cancel()
+        # Tasks may be parked on a long sleep or the tick queue: cancel and reap them
+        tasks = (t1, t2, t3, t4, t5, t6)
+        for t in tasks:
+            t.cancel()
+        try:
+            await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), timeout=5)
+        except asyncio.TimeoutError:
+            logger.warning("Shutdown: tasks did not finish within 5s.")
+        
+        # Drop queued blocking jobs; in-flight REST calls are bounded by the session timeout
+        self.executor.shutdown(wait=False, cancel_futures=True)
 
 if __name__ == "__main__":
     bot = BotOrchestrator()
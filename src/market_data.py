@@ -1,13 +1,26 @@
+import os
 import time
+import asyncio
 import logging
-import requests
-import json
 import threading
+import socket
+import queue
 import websocket
 import struct
+import itertools
 from urllib.parse import urlencode
 from auth_manager import SaxoAuthManager
 from logger_config import logger
+import fast_json
+
+# Small control frames (pings, pongs) must not sit in the Nagle buffer.
+# websocket-client sets this by default today; pinned here so it doesn't depend on that.
+_WS_SOCKOPT = ((socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),)
+
+# Fixed frame header: MessageId (u64), Reserved (u16), RefId Length (u8)
+_FRAME_HEADER = struct.Struct('<QHB')
+# Follows the RefId: Payload Format (u8), Payload Size (u32)
+_PAYLOAD_PREFIX = struct.Struct('<BI')
 
 def decode_saxo_message(message):
     """
@@ -21,28 +34,16 @@ def decode_saxo_message(message):
     [..]    Payload Size (4 bytes, Little Endian)
     [..]    Payload Data
     """
-    offset = 0
-    msg_id = struct.unpack_from('<Q', message, offset)[0]
-    offset += 8
-    
-    # Reserved
-    offset += 2
-    
-    # RefId Length
-    ref_id_len = struct.unpack_from('B', message, offset)[0]
-    offset += 1
+    # Header and payload prefix are each a single precompiled unpack
+    msg_id, _reserved, ref_id_len = _FRAME_HEADER.unpack_from(message, 0)
+    offset = _FRAME_HEADER.size
     
     # RefId
     ref_id = message[offset:offset+ref_id_len].decode('ascii')
     offset += ref_id_len
     
-    # Payload Format
-    payload_format = struct.unpack_from('B', message, offset)[0]
-    offset += 1
-    
-    # Payload Size
-    payload_size = struct.unpack_from('<I', message, offset)[0]
-    offset += 4
+    payload_format, payload_size = _PAYLOAD_PREFIX.unpack_from(message, offset)
+    offset += _PAYLOAD_PREFIX.size
     
     # Payload
     payload_data = message[offset:offset+payload_size]
@@ -50,7 +51,7 @@ def decode_saxo_message(message):
     decoded_payload = None
     if payload_format == 0: # JSON
         try:
-             decoded_payload = json.loads(payload_data.decode('utf-8'))
+             decoded_payload = fast_json.loads(payload_data) # bytes in, no intermediate str
         except:
              decoded_payload = payload_data # Fallback
     else:
@@ -64,24 +65,89 @@ def decode_saxo_message(message):
     }
 
 class MarketDataManager:
-    def __init__(self, auth_manager=None, context_id='BotContext'):
+    TICK_QUEUE_SIZE = 1024 # Bounded: a stalled consumer sheds the oldest ticks, not memory
+    PRICE_LOG_INTERVAL = 1.0 # seconds between "Price Update" log lines
+    RAW_QUEUE_SIZE = 4096 # Frames buffered between the WS receive thread and the decoder
+    STATE_SWEEP_SIZE = 512 # Past this many entries beyond the active set, drop state for UICs no longer subscribed
+    DRAIN_BATCH = 64 # Max frames the decoder folds into one state publish
+    CONNECT_TIMEOUT = 10 # seconds start_stream() waits for the socket to open
+
+    def __init__(self, auth_manager=None, context_id='BotContext', debug_raw=False, session=None):
         self.auth = auth_manager if auth_manager else SaxoAuthManager()
+        # Subscribe/unsubscribe reuse the pooled keep-alive session from the auth manager
+        self.session = session if session else self.auth.session
+        base_url = os.getenv("SAXO_BASE_URL", "https://gateway.saxobank.com/sim/openapi")
+        self._subscriptions_url = f"{base_url}/trade/v1/infoprices/subscriptions"
         # WebSocket Streaming URL for Simulation
         # Verified correct URL: wss://sim-streaming.saxobank.com/sim/oapi/streaming/ws/connect
         self.streaming_url = "wss://sim-streaming.saxobank.com/sim/oapi/streaming/ws/connect" # Note 'oapi' not 'openapi'
         self.context_id = context_id
         self.ref_id = "PriceSub_1"
-        self.live_market_state = {} # uic -> {LastPrice, QuoteUpdated}
+        # uic -> {LastPrice, Updated}. Copy-on-write: writers (under _lock) swap in a
+        # new dict, so get_latest_price() reads the current reference without locking.
+        self.live_market_state = {}
+        self.debug_raw = debug_raw # Also keep the full parsed item as "Raw" (diagnostics only)
+        # Process-wide tick sequence: unique per update, unlike time.time() floats
+        self._tick_seq = itertools.count(1)
+        self._ref_counter = itertools.count(1) # RefId suffixes for dynamic subscriptions
         self.ws = None
-        self.active_uics = []
+        self.active_uics = set() # O(1) membership checks under _lock
+        # Bumped (under _lock) whenever active_uics changes; see get_active_snapshot()
+        self.universe_version = 0
+        self._active_snapshot = (0, ())
         self.uic_ref_map = {} # uic -> ref_id
+        self._unsubscribing = set() # UICs with a DELETE in flight (guarded by _lock)
         self.subscription_start_times = {} # uic -> start_ts
         self._lock = threading.Lock()
         self._stop_event = threading.Event()
+        self._connected = threading.Event() # Set once the socket is open and subscribed
+        # Tick events for asyncio consumers, fed from the WebSocket thread (see attach_event_loop)
+        self._loop = None
+        self.tick_queue = None
+        self._last_price_log = 0.0 # monotonic ts of the last "Price Update" line
+        # Raw WS frames, decoded off the receive thread (see _consume_raw)
+        self._raw_q = queue.Queue(maxsize=self.RAW_QUEUE_SIZE)
+        self._raw_consumer = None
+
+    def attach_event_loop(self, loop):
+        """
+        Publishes every price update as a (uic, price, seq) tuple on
+        self.tick_queue, an asyncio.Queue owned by `loop`.
+        Must be called from the loop's thread, before start_stream().
+        """
+        self.tick_queue = asyncio.Queue(maxsize=self.TICK_QUEUE_SIZE)
+        self._loop = loop
+
+    def _publish_ticks(self, ticks):
+        # Runs on the event loop thread
+        queue = self.tick_queue
+        for tick in ticks:
+            try:
+                queue.put_nowait(tick)
+            except asyncio.QueueFull:
+                # Newest price wins: drop the stalest queued tick
+                queue.get_nowait()
+                queue.put_nowait(tick)
+                logger.warning("Tick queue full, dropped oldest tick.")
+
+    def get_active_snapshot(self):
+        """
+        Returns an immutable tuple of the active UICs. It's only rebuilt when
+        universe_version changes, so repeated readers don't copy the set.
+        """
+        version, snapshot = self._active_snapshot
+        if version != self.universe_version:
+            with self._lock:
+                version = self.universe_version
+                snapshot = tuple(self.active_uics)
+                self._active_snapshot = (version, snapshot)
+        return snapshot
 
     def start_stream(self, uics):
         """Starts the WebSocket stream and subscribes to the given UICs."""
-        self.active_uics = list(uics) # Copy
+        with self._lock:
+            self.active_uics = set(uics) # Copy
+            self.universe_version += 1
         token = self.auth.ensure_valid_token()
         if not token:
             logger.error("No valid token for streaming.")
@@ -97,13 +163,19 @@ class MarketDataManager:
         
 
 
+        # Decoder thread: keeps the socket read loop free of JSON parsing and state updates
+        if self._raw_consumer is None:
+            self._raw_consumer = threading.Thread(target=self._consume_raw, daemon=True)
+            self._raw_consumer.start()
+
         # Connect via Thread using a robust loop
         wst = threading.Thread(target=self._connection_manager_loop, args=(url_base, headers))
         wst.daemon = True
         wst.start()
         
-        # Give it a moment (async connect)
-        time.sleep(2)
+        # Return as soon as the socket is open and subscribed, not after a fixed stall
+        if not self._connected.wait(timeout=self.CONNECT_TIMEOUT):
+            logger.warning("WebSocket not connected after %ss; continuing, the stream will keep retrying.", self.CONNECT_TIMEOUT)
 
     def _connection_manager_loop(self, url_base, headers):
         """Maintains the WebSocket connection, reconnecting if it drops."""
@@ -130,7 +202,9 @@ class MarketDataManager:
             )
             
             # This blocks until connection closes
-            self.ws.run_forever()
+            # Frames are binary, so UTF-8 validation (text frames only) is wasted work
+            self.ws.run_forever(sockopt=_WS_SOCKOPT, ping_interval=20, ping_timeout=10,
+                                skip_utf8_validation=True)
             
             if not self._stop_event.is_set():
                 logger.warning("WebSocket Stream Disconnected! Attempting reconnect in 5 seconds...")
@@ -144,7 +218,9 @@ class MarketDataManager:
 
     def _on_open(self, ws):
         logger.info("WebSocket Connected! Setting up subscriptions...")
-        self._subscribe_uics(self.active_uics)
+        # Snapshot: the set may change on other threads while the POST is built
+        self._subscribe_uics(list(self.get_active_snapshot()))
+        self._connected.set()
 
     def _on_error(self, ws, error):
         logger.error(f"WebSocket Error: {error}")
@@ -152,6 +228,7 @@ class MarketDataManager:
             logger.critical("CRITICAL: WebSocket Subscription Limit Reached! Pausing Scanner additions.")
 
     def _on_close(self, ws, close_status_code, close_msg):
+        self._connected.clear()
         logger.info(f"WebSocket Closed: {close_status_code} - {close_msg}")
 
     def _subscribe_uics(self, uics, ref_id_suffix=""):
@@ -160,13 +237,8 @@ class MarketDataManager:
             # Prevent InvalidModelState error from empty list
             return
 
-        token = self.auth.ensure_valid_token()
-        url = "https://gateway.saxobank.com/sim/openapi/trade/v1/infoprices/subscriptions"
-        
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
+        # Cached per token by the auth manager (Authorization + Content-Type)
+        headers = self.auth.get_headers()
         
         # Unique RefID for this batch
         final_ref_id = self.ref_id + ref_id_suffix
@@ -182,7 +254,8 @@ class MarketDataManager:
         }
         
         try:
-            resp = requests.post(url, headers=headers, json=data)
+            # Pre-encoded body (orjson when available); headers already carry Content-Type
+            resp = self.session.post(self._subscriptions_url, headers=headers, data=fast_json.dumps(data))
             if resp.status_code == 201:
                 logger.info(f"Subscription confirmed for UICs: {uics} (RefId: {final_ref_id})")
                 
@@ -193,34 +266,63 @@ class MarketDataManager:
                         # Record start time for pruning if not present
                         if uic not in self.subscription_start_times:
                             self.subscription_start_times[uic] = time.time()
+                    if self._needs_sweep(self.uic_ref_map):
+                        self._sweep_orphans()
 
                 # Process initial snapshot if present
-                snapshot = resp.json().get('Snapshot', {})
+                snapshot = fast_json.loads(resp.content).get('Snapshot', {})
                 if snapshot:
                     self._process_data_list(snapshot.get('Data', []))
             else:
                 resp_text = resp.text
                 logger.error(f"Failed to subscribe: {resp_text}")
+                if resp.status_code == 401:
+                    self.auth.invalidate_token() # Next call refreshes instead of reusing cached headers
                 
                 if "SubscriptionLimitExceeded" in resp_text or resp.status_code == 403: # 403 often limits
                      logger.critical("CRITICAL: API Subscription Limit Reached! Pruning required.")
         except Exception as e:
             logger.error(f"Subscription error: {e}")
 
-    def subscribe_to_ticker(self, uic):
-        """Adds a single UIC to the monitoring stream dynamically."""
+    def subscribe_to_ticker(self, uic, ref_id_suffix=None):
+        """
+        Adds a single UIC to the monitoring stream dynamically.
+        Callers that already hold a unique suffix can pass it to skip building one.
+        """
         with self._lock:
             if uic in self.active_uics:
                 logger.debug(f"UIC {uic} is already tracked.")
                 return
             
-            self.active_uics.append(uic)
+            self.active_uics.add(uic)
+            self.universe_version += 1
             self.subscription_start_times[uic] = time.time() # Start Clock
         
-        # Subscribe using a unique RefId suffix relative to time + uic to avoid collisions
-        suffix = f"_{uic}_{int(time.time())}"
-        self._subscribe_uics([uic], ref_id_suffix=suffix)
+        # Unique RefId suffix: a counter can't collide for UICs added in the same second
+        if ref_id_suffix is None:
+            ref_id_suffix = "_%d_%d" % (uic, next(self._ref_counter))
+        self._subscribe_uics([uic], ref_id_suffix=ref_id_suffix)
         
+    def subscribe_to_tickers(self, uics, ref_id_suffix=None):
+        """
+        Adds many UICs with a single subscription POST (one RefId for the group)
+        instead of one round trip per UIC. Already-tracked UICs are skipped.
+        """
+        now = time.time()
+        with self._lock:
+            new_uics = [uic for uic in dict.fromkeys(uics) if uic not in self.active_uics]
+            if not new_uics:
+                return
+            self.active_uics.update(new_uics)
+            self.universe_version += 1
+            for uic in new_uics:
+                self.subscription_start_times[uic] = now # Start Clock
+        
+        self._subscribe_uics(new_uics, ref_id_suffix=ref_id_suffix or self._bulk_suffix())
+
+    def _bulk_suffix(self):
+        return "_bulk_%d" % next(self._ref_counter)
+
     def add_to_stream(self, uic):
         """Public alias for adding to stream."""
         self.subscribe_to_ticker(uic)
@@ -244,103 +346,236 @@ class MarketDataManager:
         
         if to_remove:
             logger.info(f"Pruning {len(to_remove)} stale subscriptions...")
-            for uic in to_remove:
-                self.unsubscribe_from_ticker(uic)
+            self.unsubscribe_from_tickers(to_remove)
 
     def unsubscribe_from_ticker(self, uic):
         """Removes a UIC from monitoring and deletes its subscription."""
-        ref_id = None
+        self.unsubscribe_from_tickers([uic])
+
+    def unsubscribe_from_tickers(self, uics):
+        """
+        Removes UICs from monitoring and deletes their subscriptions.
+        A RefId can cover several UICs (initial or bulk subscribe): each affected
+        RefId is deleted once, and the UICs that shared it but aren't being
+        removed are re-subscribed together so they keep streaming.
+        """
+        remove = set(uics)
+        by_ref = {} # ref_id -> UICs to remove
         
         with self._lock:
-             if uic not in self.active_uics:
-                 logger.warning(f"UIC {uic} not found in active list.")
+             # A concurrent call (pruner vs. strategy exit) already owns these DELETEs
+             remove -= self._unsubscribing
+             if not remove:
                  return
+             self._unsubscribing |= remove
+             for uic in remove:
+                 if uic not in self.active_uics:
+                     logger.warning(f"UIC {uic} not found in active list.")
+                     continue
+                 
+                 ref_id = self.uic_ref_map.get(uic)
+                 if not ref_id:
+                     logger.warning(f"No Reference ID found for UIC {uic}. Cannot unsubscribe via API.")
+                     # Still remove from local tracking
+                     self._forget_uic(uic)
+                     continue
+                 by_ref.setdefault(ref_id, []).append(uic)
              
-             ref_id = self.uic_ref_map.get(uic)
-             if not ref_id:
-                 logger.warning(f"No Reference ID found for UIC {uic}. Cannot unsubscribe via API.")
-                 # Still remove from local tracking
-                 self.active_uics.remove(uic)
-                 if uic in self.live_market_state: del self.live_market_state[uic]
-                 if uic in self.subscription_start_times: del self.subscription_start_times[uic]
-                 return
-        
-        # Call API to DELETE subscription
-        token = self.auth.ensure_valid_token()
-        # DELETE /trade/v1/infoprices/subscriptions/{ContextId}/{ReferenceId}
-        url = f"https://gateway.saxobank.com/sim/openapi/trade/v1/infoprices/subscriptions/{self.context_id}/{ref_id}"
-        headers = {"Authorization": f"Bearer {token}"}
+             siblings = {} # ref_id -> UICs on that RefId that stay
+             for uic, ref_id in self.uic_ref_map.items():
+                 if ref_id in by_ref and uic not in remove:
+                     siblings.setdefault(ref_id, []).append(uic)
         
         try:
-            resp = requests.delete(url, headers=headers)
-            if resp.status_code in [202, 204, 200]:
-                logger.info(f"Unsubscribed from UIC {uic} (RefId: {ref_id})")
-                
-                # Cleanup Local State
-                with self._lock:
-                    if uic in self.active_uics: self.active_uics.remove(uic)
-                    if uic in self.uic_ref_map: del self.uic_ref_map[uic]
-                    if uic in self.live_market_state: del self.live_market_state[uic]
-                    if uic in self.subscription_start_times: del self.subscription_start_times[uic]
+            resubscribe = []
+            for ref_id, ref_uics in by_ref.items():
+                # Call API to DELETE subscription
+                # DELETE /trade/v1/infoprices/subscriptions/{ContextId}/{ReferenceId}
+                url = f"{self._subscriptions_url}/{self.context_id}/{ref_id}"
+            
+                try:
+                    resp = self.session.delete(url, headers=self.auth.get_headers())
+                    if resp.status_code in [202, 204, 200]:
+                        logger.info(f"Unsubscribed from UICs {ref_uics} (RefId: {ref_id})")
                     
-            else:
-                logger.error(f"Failed to unsubscribe UIC {uic}: {resp.status_code} {resp.text}")
-                
-        except Exception as e:
-            logger.error(f"Unsubscription error: {e}")
+                        # Cleanup Local State
+                        with self._lock:
+                            for uic in ref_uics:
+                                self._forget_uic(uic)
+                        resubscribe.extend(siblings.get(ref_id, []))
+                        
+                    else:
+                        logger.error(f"Failed to unsubscribe UICs {ref_uics}: {resp.status_code} {resp.text}")
+                    
+                except Exception as e:
+                    logger.error(f"Unsubscription error: {e}")
+        
+            if resubscribe:
+                logger.info(f"Re-subscribing {len(resubscribe)} UICs that shared a removed RefId.")
+                self._subscribe_uics(resubscribe, ref_id_suffix=self._bulk_suffix())
+        finally:
+            with self._lock:
+                self._unsubscribing -= remove
+
+    def _needs_sweep(self, mapping):
+        """
+        True once a map holds STATE_SWEEP_SIZE more entries than there are active UICs.
+        Keyed on orphans, not raw size: a large active set mustn't sweep on every tick. Caller holds _lock.
+        """
+        return len(mapping) > len(self.active_uics) + self.STATE_SWEEP_SIZE
+
+    def _sweep_orphans(self):
+        """
+        Drops price state and RefIds of UICs that are no longer active, e.g. a late
+        tick or a subscribe confirmation that raced an unsubscribe. Caller holds _lock.
+        """
+        active = self.active_uics
+        self.live_market_state = {u: v for u, v in self.live_market_state.items() if u in active}
+        self.uic_ref_map = {u: r for u, r in self.uic_ref_map.items() if u in active}
+
+    def _forget_uic(self, uic):
+        """Drops all local tracking for a UIC. Caller holds _lock."""
+        if uic in self.active_uics:
+            self.active_uics.discard(uic)
+            self.universe_version += 1
+        if uic in self.uic_ref_map: del self.uic_ref_map[uic]
+        if uic in self.live_market_state:
+            state = dict(self.live_market_state)
+            del state[uic]
+            self.live_market_state = state
+        if uic in self.subscription_start_times: del self.subscription_start_times[uic]
 
     def _on_message(self, ws, message):
-        """Callback when binary message is received."""
+        """
+        Callback when binary message is received.
+        Runs on the WebSocket receive thread, so it only enqueues: decoding and
+        state updates happen on the _consume_raw thread.
+        """
+        if isinstance(message, str):
+             # Sometimes error messages are text
+             logger.info(f"Text message received: {message}")
+             return
+
         try:
-            # Decode the binary message using custom helper
-            # Message is bytes
-            if isinstance(message, str):
-                 # Sometimes error messages are text
-                 logger.info(f"Text message received: {message}")
-                 return
+            self._raw_q.put_nowait(message)
+        except queue.Full:
+            logger.warning("Raw message queue full, dropping frame.")
 
-            decoded = decode_saxo_message(message)
+    def _consume_raw(self):
+        """
+        Worker loop: decodes queued frames and applies them to live state.
+        Blocks for one frame, then drains whatever else is already queued (up to
+        DRAIN_BATCH) so a burst is published under a single lock acquisition,
+        newest quote per UIC winning.
+        """
+        while not self._stop_event.is_set():
+            batch = [self._raw_q.get()]
+            while len(batch) < self.DRAIN_BATCH:
+                try:
+                    batch.append(self._raw_q.get_nowait())
+                except queue.Empty:
+                    break
             
-            # Decoded message structure:
-            # {
-            #   'msgId': ...,
-            #   'refId': ...,
-            #   'payload': [...] or {...}
-            # }
+            items = []
+            for message in batch:
+                try:
+                    decoded = decode_saxo_message(message)
+                    
+                    # Decoded message structure:
+                    # {
+                    #   'msgId': ...,
+                    #   'refId': ...,
+                    #   'payload': [...] or {...}
+                    # }
+                    
+                    ref_id = decoded.get('refId') or ''
+                    if ref_id and ref_id.startswith(self.ref_id):
+                        payload = decoded.get('payload')
+                        if isinstance(payload, dict):
+                            items.append(payload)
+                        elif isinstance(payload, list):
+                            items.extend(payload)
+                        
+                except Exception as e:
+                    logger.error(f"Error decoding message: {e}")
             
-            rx_ref = decoded.get('refId')
-            # logger.debug(f"WS RX: RefId={rx_ref}")
-
-            ref_id = rx_ref or ''
-            if ref_id and ref_id.startswith(self.ref_id):
-                payload = decoded.get('payload')
-                self._process_data_list(payload)
-                
-        except Exception as e:
-            logger.error(f"Error decoding/processing message: {e}")
+            if not items:
+                continue
+            try:
+                # A lone single-instrument frame keeps the dict fast path
+                self._process_data_list(items[0] if len(items) == 1 else items)
+            except Exception as e:
+                logger.error(f"Error processing message: {e}")
 
     def _process_data_list(self, data):
         """Updates internal state with new price data."""
-        if not isinstance(data, list):
-             data = [data]
+        now = time.time() # One arrival timestamp for the whole message
+
+        if isinstance(data, dict):
+            # Common streaming case, one instrument per frame: no list or batch dict
+            update = self._extract_update(data, now)
+            if update is None:
+                return
+            uic, state, tick = update
+            with self._lock:
+                live = dict(self.live_market_state)
+                live[uic] = state
+                self.live_market_state = live # atomic reference swap
+                if self._needs_sweep(self.live_market_state):
+                    self._sweep_orphans()
+            self._after_update([tick])
+            return
+
+        # Build the updates without holding the lock; publish them in one critical section
+        new_state = {}
+        ticks = []
+        for item in data:
+            update = self._extract_update(item, now)
+            if update is not None:
+                uic, state, tick = update
+                new_state[uic] = state
+                ticks.append(tick)
 
+        if not new_state:
+            return
         with self._lock:
-            for item in data:
-                uic = item.get("Uic")
-                quote = item.get("Quote", {})
-                last_price = quote.get("LastTraded") or quote.get("Ask") or quote.get("Bid")
-                
-                if uic and last_price:
-                    self.live_market_state[uic] = {
-                        "LastPrice": last_price,
-                        "Updated": time.time(),
-                        "Raw": item
-                    }
-                    logger.info(f"Price Update: UIC {uic} = {last_price}")
+            live = dict(self.live_market_state)
+            live.update(new_state)
+            self.live_market_state = live # atomic reference swap
+            if self._needs_sweep(self.live_market_state):
+                self._sweep_orphans()
+        self._after_update(ticks)
+
+    def _extract_update(self, item, now):
+        """Returns (uic, state, tick) for a priced item, or None."""
+        uic = item.get("Uic")
+        quote = item.get("Quote", {})
+        last_price = quote.get("LastTraded") or quote.get("Ask") or quote.get("Bid")
+        
+        if not (uic and last_price):
+            return None
+        seq = next(self._tick_seq) # atomic under the GIL, safe across feeder threads
+        state = {"LastPrice": last_price, "Updated": now, "Seq": seq}
+        if self.debug_raw:
+            state["Raw"] = item
+        return uic, state, (uic, last_price, seq)
+
+    def _after_update(self, ticks):
+        """Throttled logging and tick publication, outside the lock."""
+        # Per-tick logging floods the handler queue under bursts: at most one line per interval
+        mono = time.monotonic()
+        if mono - self._last_price_log >= self.PRICE_LOG_INTERVAL:
+            self._last_price_log = mono
+            uic, last_price, _ = ticks[-1]
+            logger.debug("Price Update: %d tick(s), latest UIC %s = %s", len(ticks), uic, last_price)
+
+        # One loop wakeup per message, not per tick
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._publish_ticks, ticks)
 
     def get_latest_price(self, uic):
-        with self._lock:
-            return self.live_market_state.get(uic, {}).get("LastPrice")
+        # Lockless: the state dict is never mutated after publication, only replaced
+        return self.live_market_state.get(uic, {}).get("LastPrice")
 
 if __name__ == "__main__":
     # Test
@@ -1,8 +1,10 @@
 from collections import defaultdict
 from logger_config import logger
 import os
+import atexit
 import psutil
 import datetime
+import time
 import json
 
 class DailyReporter:
@@ -10,7 +12,32 @@ class DailyReporter:
         self.log_dir = log_dir
         self.account = account_manager
         self.daily_report_path = os.path.join(log_dir, 'daily_report.log')
+        self._report_fh = None # Opened on first write, kept open (line-buffered)
+        self._ts_sec = None # Wall-clock second the cached timestamp prefix belongs to
+        self._ts_prefix = ''
         
+    def _now_str(self):
+        """Local 'YYYY-mm-dd HH:MM:SS.mmm'; strftime only runs once per second."""
+        t = time.time()
+        sec = int(t)
+        if sec != self._ts_sec:
+            self._ts_sec = sec
+            self._ts_prefix = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(sec))
+        return "%s.%03d" % (self._ts_prefix, (t - sec) * 1000)
+
+    def _write_report(self, msg):
+        """Appends a timestamped line to daily_report.log through one persistent handle."""
+        if self._report_fh is None:
+            self._report_fh = open(self.daily_report_path, 'a', buffering=1, encoding='utf-8')
+            atexit.register(self.close)
+        self._report_fh.write(f"{self._now_str()} - {msg}\n")
+
+    def close(self):
+        """Closes the report file handle (also run at exit)."""
+        if self._report_fh is not None:
+            self._report_fh.close()
+            self._report_fh = None
+
     def log_health(self, strategy):
         """
         Logs bot health metrics: CPU, RAM, Active Positions, Peak Tracking.
@@ -35,8 +62,7 @@ class DailyReporter:
             
             # Log to main log and reporting log
             logger.info(msg)
-            with open(self.daily_report_path, 'a') as f:
-                f.write(f"{datetime.datetime.now()} - {msg}\n")
+            self._write_report(msg)
                 
         except Exception as e:
             logger.error(f"Error logging health: {e}")
@@ -66,5 +92,4 @@ class DailyReporter:
         """
         msg = f"[DRY RUN] WOULD HAVE {action} {uic} @ {price}. Reason: {reason}"
         logger.info(msg)
-        with open(self.daily_report_path, 'a') as f:
-            f.write(f"{datetime.datetime.now()} - {msg}\n")
+        self._write_report(msg)
@@ -1,20 +1,88 @@
-import requests
+import os
 import time
 import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from logger_config import logger
+from http_client import parse_retry_after
+import fast_json
+
+try:
+    from zoneinfo import ZoneInfo
+    _US_EASTERN = ZoneInfo("America/New_York")
+except Exception:
+    # No tz database (e.g. Windows without tzdata): scan around the clock
+    _US_EASTERN = None
 
 class MarketScanner:
-    def __init__(self, auth_manager, market_data_manager, rate_limiter=None):
+    SURGE_PCT = 3.0 # Minimum PercentChange for a hot candidate
+    BATCH_SIZE = 50 # UICs per infoprices/list request
+    SCAN_WORKERS = 4 # Concurrent batch requests per scan
+    MIN_PRICE, MAX_PRICE = 1.0, 20.0 # Tradable price band (Micro-Capital)
+    # UICs priced this far (fractionally) outside the band are left out of scans
+    # until the next full scan, which runs every FULL_SCAN_INTERVAL seconds
+    BAND_MARGIN = 0.25
+    FULL_SCAN_INTERVAL = 3600
+
+    def __init__(self, auth_manager, market_data_manager, rate_limiter=None, session=None):
         self.auth = auth_manager
+        # Keep-alive pooled session shared with the auth manager: batches reuse one TLS connection
+        self.session = session if session else self.auth.session
+        base_url = os.getenv("SAXO_BASE_URL", "https://gateway.saxobank.com/sim/openapi")
+        self._instruments_url = f"{base_url}/ref/v1/instruments"
+        self._infoprices_url = f"{base_url}/trade/v1/infoprices/list"
         self.md = market_data_manager
         self.rate_limiter = rate_limiter
         self.running = False
+        self._stop_event = threading.Event() # Wakes the loop and batch pauses on stop()
         self.scan_interval = 300 # 5 minutes
         self.universe_uics = []
 
+    @property
+    def universe_uics(self):
+        return self._universe_uics
+
+    @universe_uics.setter
+    def universe_uics(self, uics):
+        # The batch URLs only change with the universe: rebuilt lazily on next scan
+        self._universe_uics = uics
+        self._out_of_band = set() # UICs last seen priced well outside the band
+        self._last_full_scan = None # monotonic ts
+        self._full_scan_start = 0 # First batch of the next full scan (resumes a cut-short pass)
+        self._batch_urls = {}
+
+    def _set_out_of_band(self, uics):
+        if uics != self._out_of_band:
+            self._out_of_band = uics
+            self._batch_urls.pop(False, None) # Banded URL list is stale
+
+    def _get_batch_urls(self, full):
+        """
+        Fully formatted infoprices/list URLs, one per scan batch. `full` covers the
+        whole universe; otherwise out-of-band UICs are left out. Cached until the
+        universe (or the out-of-band set) changes.
+        """
+        urls = self._batch_urls.get(full)
+        if urls is None:
+            uics = self._universe_uics
+            if not full:
+                uics = [uic for uic in uics if uic not in self._out_of_band]
+            size = self.BATCH_SIZE
+            template = self._infoprices_url + "?Uics={}&AssetType=Stock"
+            urls = [template.format(",".join(map(str, uics[i:i + size])))
+                    for i in range(0, len(uics), size)]
+            self._batch_urls[full] = urls
+        return urls
+
+    def _is_out_of_band(self, price):
+        """True if a price is too far outside [MIN_PRICE, MAX_PRICE] to qualify before the next full scan."""
+        return bool(price) and (price > self.MAX_PRICE * (1 + self.BAND_MARGIN) or
+                                price < self.MIN_PRICE * (1 - self.BAND_MARGIN))
+
     def start(self):
         """Starts the background scanning loop."""
         self.running = True
+        self._stop_event.clear()
         # Initial Universe Fetch
         try:
             self.universe_uics = self.get_us_universe()
@@ -29,61 +97,104 @@ class MarketScanner:
         t.start()
         logger.info(f"Market Scanner loop started (Interval: {self.scan_interval}s)")
 
+    def stop(self):
+        """Stops the scanning loop without waiting out the current interval."""
+        self.running = False
+        self._stop_event.set()
+
     def get_us_universe(self):
         """
         Fetches 'broad market' universe from Saxo via ExchangeId=NYSE/NASDAQ.
+        The per-exchange (and fallback per-keyword) queries are independent,
+        so they run concurrently on the pooled session.
         """
-        token = self.auth.ensure_valid_token()
-        if not token: return []
+        # Cached per token by the auth manager; one token for the whole fan-out
+        headers = self.auth.get_headers()
+        if not headers: return []
         
         uics = set()
-        url = "https://gateway.saxobank.com/sim/openapi/ref/v1/instruments"
-        headers = {"Authorization": f"Bearer {token}"}
         
         # User requested Exchanges
         exchanges = ["NYSE", "NASDAQ"]
         
-        for ex in exchanges:
-            params = {
-                'ExchangeId': ex,
-                'AssetTypes': 'Stock',
-                'IncludeNonTradable': False
-            }
-            try:
-                resp = requests.get(url, headers=headers, params=params)
-                if resp.status_code == 200:
-                    data = resp.json().get('Data', [])
-                    count = 0
-                    for item in data:
-                        # Ensure strictly Stock
-                        if item.get('AssetType') == 'Stock':
-                            uics.add(item.get('Identifier'))
-                            count += 1
-                    logger.info(f"Loaded {count} instruments from {ex}")
-                else:
-                    logger.warning(f"Failed to fetch {ex} universe: {resp.status_code} {resp.text}")
-                    
-            except Exception as e:
-                logger.error(f"Universe search error for {ex}: {e}")
+        with ThreadPoolExecutor(max_workers=len(exchanges)) as pool:
+            for found in pool.map(lambda ex: self._fetch_exchange_uics(ex, headers), exchanges):
+                uics.update(found)
                 
         # Fallback if empty (Sim might not index cleanly by ExchangeId without specific subscription)
         if not uics:
             logger.warning("Exchange fetch returned 0 results. Falling back to Keyword search for 'US Tech'...")
             # Fallback Logic (Quick Copy)
             keywords = ["Apple", "Microsoft", "Tesla", "Amazon", "Nvidia"]
-            for kw in keywords:
-                try:
-                    p = {'Keywords': kw, 'AssetTypes': 'Stock'}
-                    r = requests.get(url, headers=headers, params=p)
-                    if r.status_code == 200:
-                        for i in r.json().get('Data', []):
-                           uics.add(i.get('Identifier'))
-                except: pass
+            with ThreadPoolExecutor(max_workers=len(keywords)) as pool:
+                for found in pool.map(lambda kw: self._fetch_keyword_uics(kw, headers), keywords):
+                    uics.update(found)
                 
         return list(uics)
 
+    def _fetch_exchange_uics(self, ex, headers):
+        """Returns the set of Stock UICs listed on one exchange."""
+        uics = set()
+        params = {
+            'ExchangeId': ex,
+            'AssetTypes': 'Stock',
+            'IncludeNonTradable': False
+        }
+        try:
+            resp = self.session.get(self._instruments_url, headers=headers, params=params)
+            if resp.status_code == 200:
+                data = fast_json.loads(resp.content).get('Data', [])
+                for item in data:
+                    # Ensure strictly Stock
+                    if item.get('AssetType') == 'Stock':
+                        uics.add(item.get('Identifier'))
+                logger.info(f"Loaded {len(uics)} instruments from {ex}")
+            else:
+                logger.warning(f"Failed to fetch {ex} universe: {resp.status_code} {resp.text}")
+                
+        except Exception as e:
+            logger.error(f"Universe search error for {ex}: {e}")
+        return uics
+
+    def _fetch_keyword_uics(self, kw, headers):
+        """Returns the set of UICs matching one keyword search."""
+        try:
+            p = {'Keywords': kw, 'AssetTypes': 'Stock'}
+            r = self.session.get(self._instruments_url, headers=headers, params=p)
+            if r.status_code == 200:
+                return {i.get('Identifier') for i in fast_json.loads(r.content).get('Data', [])}
+        except: pass
+        return set()
+
+    def seconds_until_open(self, now=None):
+        """
+        Seconds until the next US regular session (Mon-Fri 09:30-16:00 New York),
+        0.0 while it's open. Exchange holidays are not modelled.
+        """
+        if _US_EASTERN is None:
+            return 0.0
+        now = now or datetime.now(_US_EASTERN)
+        open_today = now.replace(hour=9, minute=30, second=0, microsecond=0)
+        close_today = now.replace(hour=16, minute=0, second=0, microsecond=0)
+        if now.weekday() < 5 and open_today <= now < close_today:
+            return 0.0
+
+        next_open = open_today if now < open_today else open_today + timedelta(days=1)
+        while next_open.weekday() >= 5:
+            next_open += timedelta(days=1)
+        # Via timestamps: same-tzinfo subtraction would ignore a DST change in between
+        return next_open.timestamp() - now.timestamp()
+
     def _scan_loop(self):
         while self.running:
+            wait = self.seconds_until_open()
+            if wait > 0:
+                # Quotes don't move while the market is closed: don't spend API quota on them
+                logger.info(f"Market closed. Next scan in {wait / 3600:.1f}h.")
+                self._stop_event.wait(wait)
+                continue
+
+            started = time.monotonic()
             try:
                 hot_list = self.perform_market_scan()
                 if hot_list:
@@ -92,73 +203,137 @@ class MarketScanner:
                     uic_display = [h[0] for h in hot_list]
                     logger.info(f"Scanner found {len(hot_list)} Hot Candidates: {uic_display}")
                     
-                    for uic, price, asset_type in hot_list:
-                         # Dynamic Subscription
-                         self.md.add_subscription(uic)
+                    # Dynamic Subscription: one POST for the whole batch
+                    self.md.subscribe_to_tickers(uic_display)
             except Exception as e:
                 logger.error(f"Scanner Loop Error: {e}")
             
-            time.sleep(self.scan_interval)
+            # Interval is start-to-start (no drift from slow scans); stop() cuts it short
+            self._stop_event.wait(max(0.0, self.scan_interval - (time.monotonic() - started)))
 
     def perform_market_scan(self):
         """
-        Scans the universe in batches of 50.
+        Scans the universe in batches of BATCH_SIZE, up to SCAN_WORKERS batches in flight.
+        Between hourly full scans, instruments priced far outside the band are skipped:
+        most of the universe can't become a candidate, so it isn't fetched and parsed.
+        A full scan cut short by the rate limiter resumes at its first unread batch.
         Returns list of (uic, price, asset_type) tuples for 'Hot Candidates'.
         """
         if not self.universe_uics:
             logger.warning("Empty universe, skipping scan.")
             return []
 
-        token = self.auth.ensure_valid_token()
-        if not token: return []
+        now = time.monotonic()
+        full = self._last_full_scan is None or now - self._last_full_scan >= self.FULL_SCAN_INTERVAL
+        urls = self._get_batch_urls(full)
+        if not full:
+            logger.info(f"Scanner: skipping {len(self._out_of_band)} out-of-band instruments until the next full scan.")
+
+        order = range(len(urls))
+        if full and self._full_scan_start:
+            # Resume where the last cut-short full scan stopped, so every batch gets its turn
+            start = self._full_scan_start
+            order = [*range(start, len(urls)), *range(start)]
 
         hot_candidates = []
-        batch_size = 50
+        out_of_band = set()
+        unread = [] # Batch indices not read (rate limited, failed or stopped)
+        halt = threading.Event() # Set on auth failure: remaining batches are skipped
+        # Batches are independent GETs on the pooled session; pacing is the RateLimiter's job
+        with ThreadPoolExecutor(max_workers=self.SCAN_WORKERS) as pool:
+            results = pool.map(lambda i: self._scan_batch(urls[i], halt), order)
+            for i, (found, skipped, ok) in zip(order, results):
+                hot_candidates.extend(found)
+                out_of_band.update(skipped)
+                if not ok: unread.append(i)
         
-        # Generator for batches
-        batches = [self.universe_uics[i:i + batch_size] for i in range(0, len(self.universe_uics), batch_size)]
+        if full:
+            # Done even if cut short: a universe bigger than the rate limit never completes in
+            # one cycle. Instruments that moved back toward the band are scanned again; those
+            # in unread batches keep their previous classification until their turn comes.
+            self._last_full_scan = now
+            self._full_scan_start = unread[0] if unread else 0
+            if unread:
+                size = self.BATCH_SIZE
+                previous = self._out_of_band
+                for i in unread:
+                    out_of_band.update(uic for uic in self._universe_uics[i * size:(i + 1) * size] if uic in previous)
+                logger.warning(f"Scanner: full scan cut short, {len(unread)}/{len(urls)} batches unread. Resuming at batch {unread[0]}.")
+            self._set_out_of_band(out_of_band)
+        elif out_of_band:
+            self._set_out_of_band(self._out_of_band | out_of_band)
         
-        for batch in batches:
-            # Rate Limiter Check per batch
-            if self.rate_limiter and not self.rate_limiter.can_proceed(priority='low'):
-                logger.warning("Scanner paused for batch due to Rate Limit.")
-                time.sleep(10) # Quick pause
-                continue
+        return hot_candidates
 
-            uic_str = ",".join(map(str, batch))
-            url = f"https://gateway.saxobank.com/sim/openapi/trade/v1/infoprices/list?Uics={uic_str}&AssetType=Stock"
-            headers = {"Authorization": f"Bearer {token}"}
-            
-            try:
-                resp = requests.get(url, headers=headers)
-                if self.rate_limiter: self.rate_limiter.add_call()
-                
+    def _scan_batch(self, url, halt):
+        """
+        Fetches one infoprices/list batch.
+        Returns (hot candidates, UICs priced out of band, whether the batch was read).
+        """
+        hot_candidates = []
+        out_of_band = []
+        if halt.is_set() or self._stop_event.is_set():
+            return hot_candidates, out_of_band, False
+
+        # Rate Limiter Check per batch (also refuses while a 429 cooldown is active)
+        if self.rate_limiter and not self.rate_limiter.reserve(priority='low'):
+            logger.warning("Scanner skipped batch due to Rate Limit.")
+            return hot_candidates, out_of_band, False
+
+        # Re-read per batch: the fast path is a dict lookup and picks up a mid-scan refresh
+        headers = self.auth.get_headers()
+        if not headers:
+            halt.set()
+            return hot_candidates, out_of_band, False
+        
+        ok = False
+        
+        try:
+            # Streamed: items are parsed and filtered as the body arrives (ijson when installed)
+            resp = self.session.get(url, headers=headers, stream=True)
+            with resp:
                 if resp.status_code == 200:
-                    data = resp.json().get('Data', [])
+                    count = 0
                     max_change = 0.0
-                    for item in data:
+                    for item in fast_json.iter_items(resp, 'Data.item'):
+                        count += 1
                         quote = item.get('Quote', {})
-                        pct = abs(quote.get('PercentChange', 0.0))
+                        change = quote.get('PercentChange', 0.0)
+                        pct = abs(change)
                         if pct > max_change: max_change = pct
-                        
+                        price = quote.get('LastTraded', 0.0)
+                        if self._is_out_of_band(price):
+                            out_of_band.append(item.get('Uic'))
+                            continue
+                    
+                        # Cheap prefilter on the fields already read: most of a batch is
+                        # outside the price band or not surging, skip the full analysis
+                        if change < self.SURGE_PCT or not (self.MIN_PRICE <= price <= self.MAX_PRICE): continue
                         res = self._analyze_hot_candidate(item)
                         if res:
                             hot_candidates.append(res)
-                            
-                    logger.info(f"Scanner Batch ({len(data)} items) processed. Top Mover: {max_change:.2f}%")
-                    
+                        
+                    logger.info(f"Scanner Batch ({count} items) processed. Top Mover: {max_change:.2f}%")
+                    ok = True
+                    # Resets the 429 backoff: orders (the other caller) are rare, or absent in simulation
+                    if self.rate_limiter: self.rate_limiter.note_success()
+                
+                elif resp.status_code == 401:
+                    # Token revoked/expired server-side before our local expiry: refresh next batch
+                    logger.warning("Scanner batch unauthorized (401). Invalidating cached token.")
+                    self.auth.invalidate_token()
                 elif resp.status_code == 429:
-                    # Backoff handled by main scanner loop if needed, or trigger global limiter
-                    retry = int(resp.headers.get("Retry-After", 60))
+                    # The session's Retry already backed off on this GET (Retry-After honoured,
+                    # capped); still limited, so cool down globally. No break: the remaining
+                    # batches each consult the limiter, which refuses them until it recovers.
+                    # Seconds or HTTP-date; None (missing/garbled) lets the limiter back off exponentially
+                    retry = parse_retry_after(resp.headers.get("Retry-After"))
                     if self.rate_limiter: self.rate_limiter.trigger_cooldown(retry)
-                    break 
-            except Exception as e:
-                logger.error(f"Batch scan error: {e}")
-            
-            # rate limit buffer
-            time.sleep(0.5)
+                    logger.warning(f"Scanner batch rate limited (429). Retry-After: {retry}")
+        except Exception as e:
+            logger.error(f"Batch scan error: {e}")
         
-        return hot_candidates
+        return hot_candidates, out_of_band, ok
 
     def _analyze_hot_candidate(self, item):
         """Checks if item meets criteria (>1.5% change) AND Price limits ($1-$20)."""
@@ -171,7 +346,7 @@ class MarketScanner:
         
         # 1. Price Filter (Micro-Capital: $1 - $20)
         # corresponds roughly to 7kr - 140kr
-        if not (1.0 <= current_price <= 20.0):
+        if not (self.MIN_PRICE <= current_price <= self.MAX_PRICE):
             return None
         
         # 2. Volatility & Liquidity Filter
@@ -184,7 +359,7 @@ class MarketScanner:
             return None
 
         # Check Surge Criteria (> 3.0%)
-        if percent_change >= 3.0:
+        if percent_change >= self.SURGE_PCT:
             symbol = item.get('DisplayAndFormat', {}).get('Symbol', f"UIC:{uic}")
             
             # Cyan Info Log
@@ -1,21 +1,29 @@
 import logging
 import collections
+import itertools
 import os
-import json
+import fast_json
 import redis
 from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
 
 class TrendFollower:
-    def __init__(self, account_manager, stop_loss_pct=0.01):
+    POSITION_KEY = "saxotrader:position:{}"
+    # A new peak is persisted once it beats the stored one by this fraction
+    PEAK_SAVE_STEP = 0.001
+
+    def __init__(self, account_manager, stop_loss_pct=0.01, redis_client=None):
         self.account = account_manager
         self.stop_loss_pct = stop_loss_pct
         
         # Redis Setup
-        self.redis_client = None
+        # An injected client (already connected by the caller) saves a second connect + PING on startup
+        self.redis_client = redis_client
         redis_url = os.getenv('REDIS_URL')
-        if redis_url:
+        if self.redis_client is not None:
+            logger.info("Using shared Redis client for state persistence.")
+        elif redis_url:
             try:
                 # Railway provides redis://...
                 self.redis_client = redis.from_url(redis_url)
@@ -31,6 +39,7 @@ class TrendFollower:
 
         # Active Positions: {uic: {'entry_price': float, 'qty': int, 'peak_price': float}}
         self.active_positions = {}
+        self._saved_peak = {} # Last peak_price written to Redis, per UIC
         
         # Load State if available
         self._load_state()
@@ -41,6 +50,14 @@ class TrendFollower:
         # EMA Settings
         self.short_period = 5
         self.long_period = 20
+        # Streaming EMAs, updated once per tick: {uic: ema}
+        self.short_ema = {}
+        self.long_ema = {}
+        # Multiplier k = 2 / (N + 1), and its complement, fixed for the object's lifetime
+        self._k_short = 2 / (self.short_period + 1)
+        self._k_long = 2 / (self.long_period + 1)
+        self._keep_short = 1 - self._k_short
+        self._keep_long = 1 - self._k_long
 
     def _load_state(self):
         """Loads active positions from Redis on startup."""
@@ -48,13 +65,11 @@ class TrendFollower:
         
         try:
             # We assume keys are stored as "saxotrader:position:{uic}"
-            match_pattern = "saxotrader:position:*"
-            keys = self.redis_client.keys(match_pattern)
-            
-            for key in keys:
-                data = self.redis_client.get(key)
-                if data:
-                    pos_data = json.loads(data)
+            match_pattern = self.POSITION_KEY.format('*')
+            # SCAN, not KEYS: doesn't block the Redis server on a large keyspace
+            keys = list(self.redis_client.scan_iter(match=match_pattern))
+            for pos_data, hashed in self._read_positions(keys):
+                if pos_data:
                     uic = pos_data.get('uic')
                     if uic:
                         # Migrate keys if old format exists
@@ -62,20 +77,66 @@ class TrendFollower:
                         if 'quantity' in pos_data: pos_data['qty'] = pos_data.pop('quantity')
                         
                         self.active_positions[int(uic)] = pos_data
+                        self._saved_peak[int(uic)] = pos_data.get('peak_price', 0)
                         logger.info(f"Restored orphaned position from Redis: UIC {uic} | Entry: {pos_data.get('entry_price')} | Peak: {pos_data.get('peak_price')}")
+                        if not hashed:
+                            # Legacy JSON string: rewrite as a Hash now, or single-field peak HSETs fail (WRONGTYPE)
+                            self._save_state(int(uic))
         except Exception as e:
             logger.error(f"Error loading state from Redis: {e}")
 
-    def _save_state(self, uic):
-        """Saves current position state to Redis."""
+    def _read_positions(self, keys):
+        """
+        Reads positions stored as a Hash of JSON-encoded fields or as a legacy JSON string.
+        Two pipelined round trips (TYPE, then HGETALL/GET) however many keys there are.
+        Returns (position or None, stored as a Hash) per key.
+        """
+        if not keys:
+            return []
+        pipe = self.redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.type(key)
+        is_hash = [t in (b'hash', 'hash') for t in pipe.execute()]
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        for key, hashed in zip(keys, is_hash):
+            if hashed:
+                pipe.hgetall(key)
+            else:
+                pipe.get(key)
+
+        positions = []
+        for raw, hashed in zip(pipe.execute(), is_hash):
+            if not raw:
+                positions.append((None, hashed))
+            elif hashed:
+                positions.append(({(k.decode() if isinstance(k, bytes) else k): fast_json.loads(v) for k, v in raw.items()}, True))
+            else:
+                positions.append((fast_json.loads(raw), False))
+        return positions
+
+    def _save_state(self, uic, field=None):
+        """
+        Saves current position state to Redis as a Hash.
+        With `field`, only that field is written (e.g. a new peak_price);
+        otherwise the whole position replaces whatever is stored.
+        """
         if not self.redis_client: return
         
         if uic in self.active_positions:
             data = self.active_positions[uic]
             data['uic'] = uic # ensure UIC is in the payload
-            key = f"saxotrader:position:{uic}"
+            key = self.POSITION_KEY.format(uic)
             try:
-                self.redis_client.set(key, json.dumps(data))
+                if field:
+                    self.redis_client.hset(key, field, fast_json.dumps(data[field]))
+                else:
+                    # DELETE first: drops stale fields and any legacy JSON-string value
+                    pipe = self.redis_client.pipeline()
+                    pipe.delete(key)
+                    pipe.hset(key, mapping={k: fast_json.dumps(v) for k, v in data.items()})
+                    pipe.execute()
+                self._saved_peak[uic] = data.get('peak_price', 0)
             except Exception as e:
                 logger.error(f"Error saving state to Redis: {e}")
 
@@ -83,7 +144,8 @@ class TrendFollower:
         """Removes position state from Redis."""
         if not self.redis_client: return
         
-        key = f"saxotrader:position:{uic}"
+        self._saved_peak.pop(uic, None)
+        key = self.POSITION_KEY.format(uic)
         try:
             self.redis_client.delete(key)
             logger.info(f"Deleted state for UIC {uic} from Redis.")
@@ -97,6 +159,7 @@ class TrendFollower:
         """
         # 1. Update History
         self.price_history[uic].append(current_price)
+        self._update_emas(uic, current_price)
         
         # 2. Check Signals
         if uic in self.active_positions:
@@ -108,12 +171,11 @@ class TrendFollower:
         """
         Checks for EMA Crossover (Short > Long).
         """
-        history = list(self.price_history[uic])
-        if len(history) < self.long_period:
+        long_ema = self.long_ema.get(uic)
+        if long_ema is None:
             return None # Not enough data
 
-        short_ema = self._calculate_ema(history, self.short_period)
-        long_ema = self._calculate_ema(history, self.long_period)
+        short_ema = self.short_ema[uic]
         
         if short_ema > long_ema:
             logger.info(f"Entry Signal for UIC {uic}: ShortEMA({short_ema:.2f}) > LongEMA({long_ema:.2f})")
@@ -140,8 +202,9 @@ class TrendFollower:
         # Update Peak
         if current_price > position['peak_price']:
             position['peak_price'] = current_price
-            # PERSIST (Update Max Price)
-            self._save_state(uic)
+            # PERSIST (Update Max Price): one HSET, and only once the peak has moved meaningfully
+            if current_price >= self._saved_peak.get(uic, 0) * (1 + self.PEAK_SAVE_STEP):
+                self._save_state(uic, field='peak_price')
             # logger.info(f"New Peak Price for UIC {uic}: {current_price}")
         
         # Calculate Stop Price
@@ -182,20 +245,20 @@ class TrendFollower:
         
         return None
 
-    def _calculate_ema(self, prices, period):
-        """Simple EMA calculation."""
-        if not prices: return 0
-        
-        # Initial SMA
-        ema = sum(prices[:period]) / period
-        
-        # Multiplier: 2 / (N + 1)
-        k = 2 / (period + 1)
-        
-        for price in prices[period:]:
-            ema = (price * k) + (ema * (1 - k))
-            
-        return ema
+    def _update_emas(self, uic, price):
+        """
+        O(1) streaming EMA update. Each EMA is seeded with the SMA of its first
+        `period` prices, then folds in one price per tick.
+        """
+        history = self.price_history[uic]
+        for emas, period, k, keep in ((self.short_ema, self.short_period, self._k_short, self._keep_short),
+                                      (self.long_ema, self.long_period, self._k_long, self._keep_long)):
+            ema = emas.get(uic)
+            if ema is not None:
+                emas[uic] = (price * k) + (ema * keep)
+            elif len(history) >= period:
+                # Initial SMA
+                emas[uic] = sum(itertools.islice(reversed(history), period)) / period
 
 if __name__ == "__main__":
     # Test Strategy Logic
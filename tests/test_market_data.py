@@ -0,0 +1,108 @@
+import sys
+import os
+import json
+import struct
+import time
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from market_data import decode_saxo_message
+
+def encode_saxo_message(msg_id, ref_id, payload, payload_format=0):
+    """Builds a frame in the Saxo streaming wire format."""
+    ref = ref_id.encode('ascii')
+    body = json.dumps(payload).encode('utf-8') if payload_format == 0 else payload
+    return (struct.pack('<QHB', msg_id, 0, len(ref)) + ref +
+            struct.pack('<BI', payload_format, len(body)) + body)
+
+# -------------------------------------------------------------------------
+# SCENARIO 1: JSON price frame round-trips through the decoder
+# -------------------------------------------------------------------------
+def test_decode_json_frame():
+    payload = [{"Uic": 211, "Quote": {"Ask": 150.25, "Bid": 150.2}}]
+    decoded = decode_saxo_message(encode_saxo_message(42, "PriceSub_1_211", payload))
+
+    assert decoded['msgId'] == 42
+    assert decoded['refId'] == "PriceSub_1_211"
+    assert decoded['payload'] == payload
+
+# -------------------------------------------------------------------------
+# SCENARIO 2: Non-JSON payloads are handed back raw
+# -------------------------------------------------------------------------
+def test_decode_non_json_frame_returns_raw_bytes():
+    decoded = decode_saxo_message(encode_saxo_message(7, "_heartbeat", b"\x01\x02", payload_format=1))
+
+    assert decoded['refId'] == "_heartbeat"
+    assert decoded['payload'] == b"\x01\x02"
+
+# -------------------------------------------------------------------------
+# SCENARIO 3: A queued burst is applied in one pass, newest quote per UIC wins
+# -------------------------------------------------------------------------
+def test_consume_raw_drains_burst():
+    import threading
+    from market_data import MarketDataManager
+
+    md = MarketDataManager(auth_manager=object(), session=object())
+    for price in (100.0, 101.0, 102.0):
+        md._raw_q.put(encode_saxo_message(1, "PriceSub_1", {"Uic": 211, "Quote": {"Ask": price}}))
+    md._raw_q.put(encode_saxo_message(2, "PriceSub_1_bulk_1", [{"Uic": 300, "Quote": {"Bid": 5.5}}]))
+
+    threading.Thread(target=md._consume_raw, daemon=True).start()
+    for _ in range(100):
+        if md.get_latest_price(300) is not None:
+            break
+        time.sleep(0.01)
+
+    assert md.get_latest_price(211) == 102.0
+    assert md.get_latest_price(300) == 5.5
+
+# -------------------------------------------------------------------------
+# SCENARIO 4: Racing unsubscribes of the same UIC send a single DELETE
+# -------------------------------------------------------------------------
+def test_concurrent_unsubscribe_deletes_once():
+    import threading
+    from market_data import MarketDataManager
+
+    class SlowSession:
+        def __init__(self):
+            self.deletes = []
+        def delete(self, url, **kwargs):
+            self.deletes.append(url)
+            time.sleep(0.05)
+            return type('Resp', (), {'status_code': 204, 'text': ''})()
+
+    class Auth:
+        def get_headers(self):
+            return {}
+
+    session = SlowSession()
+    md = MarketDataManager(auth_manager=Auth(), session=session)
+    md.active_uics = {211}
+    md.uic_ref_map = {211: "PriceSub_1_211_1"}
+
+    threads = [threading.Thread(target=md.unsubscribe_from_ticker, args=(211,)) for _ in range(5)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+
+    assert len(session.deletes) == 1
+    assert md.active_uics == set() and not md._unsubscribing
+
+# -------------------------------------------------------------------------
+# SCENARIO 5: Orphans are swept past the margin, a large active set alone isn't
+# -------------------------------------------------------------------------
+def test_sweep_triggers_on_orphans_not_size():
+    from market_data import MarketDataManager
+
+    md = MarketDataManager(auth_manager=object(), session=object())
+    md.active_uics = set(range(1, 1001)) # Well past STATE_SWEEP_SIZE, all legitimately active
+    md._process_data_list([{"Uic": u, "Quote": {"Ask": 1.0}} for u in range(1, 1001)])
+    swept = []
+    md._sweep_orphans = lambda: swept.append(True)
+    md._process_data_list({"Uic": 1, "Quote": {"Ask": 2.0}})
+    assert not swept
+
+    del md._sweep_orphans # Back to the real sweep
+    md.active_uics = set(range(1, 11))
+    md._process_data_list({"Uic": 1, "Quote": {"Ask": 3.0}})
+    assert len(md.live_market_state) == 10
@@ -17,6 +17,7 @@ class MockAccountManager(AccountManager):
         self.base_url = "mock"
         self.account_key = "mock_key"
         self.base_currency = account_currency
+        self._profit_fns = {}
         
         # Configuration for Audit
         self.fx_fee_pct = 0.005 # 0.5%
@@ -108,3 +109,37 @@ def test_profit_guard_floor():
     print(f"Scenario 3 Net Fail: {net_fail}")
 
 
+
+# -------------------------------------------------------------------------
+# SCENARIO 4: Batched audit matches the per-trade audit
+# -------------------------------------------------------------------------
+def test_batch_matches_single_trade_audit():
+    """
+    Mixed winners/losers, with FX and slippage enabled.
+    """
+    mgr = MockAccountManager(account_currency='EUR')
+    trades = [(100, 100.5, 100, 123), (100, 102, 100, 124), (50, 49, 10, 125)]
+    
+    batch = mgr.calculate_net_profit_batch(trades, instrument_currency='USD', 
+                                           account_currency='EUR', include_slippage=True)
+    single = [mgr.calculate_net_profit(e, x, q, uic=u, instrument_currency='USD', 
+                                       account_currency='EUR', include_slippage=True)
+              for e, x, q, u in trades]
+    
+    assert batch == pytest.approx(single)
+
+# -------------------------------------------------------------------------
+# SCENARIO 5: Specialised per-currency closure matches the full audit
+# -------------------------------------------------------------------------
+def test_profit_fn_matches_net_profit():
+    """
+    The closure is built once per currency pair and reused.
+    """
+    mgr = MockAccountManager(account_currency='EUR')
+    profit = mgr.make_profit_fn('USD', 'EUR', include_slippage=True)
+    assert mgr.make_profit_fn('USD', 'EUR', include_slippage=True) is profit
+    
+    comm = mgr.get_commissions(123, 100, (100 + 102) / 2)
+    expected = mgr.calculate_net_profit(100, 102, 100, uic=123, instrument_currency='USD', 
+                                        account_currency='EUR', include_slippage=True)
+    assert profit(100, 102, 100, comm) == pytest.approx(expected)
@@ -0,0 +1,63 @@
+import sys
+import os
+import threading
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from executor import RateLimiter
+
+# -------------------------------------------------------------------------
+# SCENARIO 1: Concurrent reservations never overshoot the limit
+# -------------------------------------------------------------------------
+def test_concurrent_reserve_respects_limit():
+    """
+    50 threads race for 10 slots. Exactly 10 must win.
+    """
+    limiter = RateLimiter(limit=10, window=60)
+    barrier = threading.Barrier(50)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(limiter.reserve())
+
+    threads = [threading.Thread(target=worker) for _ in range(50)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+
+    assert results.count(True) == 10
+    assert limiter.remaining_capacity() == 0
+
+# -------------------------------------------------------------------------
+# SCENARIO 2: High priority bypasses the internal counter and the cooldown
+# -------------------------------------------------------------------------
+def test_high_priority_bypasses_limit():
+    limiter = RateLimiter(limit=1, window=60)
+    assert limiter.reserve()
+    assert not limiter.reserve()
+    assert limiter.reserve(priority='high')
+
+    limiter.trigger_cooldown(30)
+    assert not limiter.can_proceed()
+    assert limiter.can_proceed(priority='high')
+
+# -------------------------------------------------------------------------
+# SCENARIO 3: 429 backoff grows without Retry-After and resets on success
+# -------------------------------------------------------------------------
+def test_cooldown_backoff_and_reset():
+    limiter = RateLimiter()
+    limiter.trigger_cooldown(2)
+    assert limiter.remaining_capacity() == 0
+
+    limiter.trigger_cooldown() # 2nd consecutive 429: 2s + jitter
+    assert limiter._consecutive_429 == 2
+    limiter.note_success()
+    assert limiter._consecutive_429 == 0
+
+def test_parse_retry_after_forms():
+    from http_client import parse_retry_after
+    assert parse_retry_after("30") == 30.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0 # in the past
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
@@ -0,0 +1,124 @@
+import sys
+import os
+import json
+import time
+import pytest
+from datetime import datetime
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from scanner import MarketScanner
+from executor import RateLimiter
+
+class FakeResponse:
+    def __init__(self, data):
+        self.status_code = 200
+        self.headers = {}
+        self.text = ''
+        self.content = json.dumps(data).encode('utf-8')
+    def __enter__(self): return self
+    def __exit__(self, *exc): pass
+
+class FakeSession:
+    """Prices even UICs at 100 (far above the band), odd UICs at 5."""
+    def __init__(self):
+        self.requested = []
+    def get(self, url, **kwargs):
+        uics = [int(u) for u in url.split('Uics=')[1].split('&')[0].split(',')]
+        self.requested.extend(uics)
+        return FakeResponse({'Data': [
+            {'Uic': u, 'Quote': {'PercentChange': 0.0, 'LastTraded': 100.0 if u % 2 == 0 else 5.0}}
+            for u in uics
+        ]})
+
+class FakeAuth:
+    def __init__(self):
+        self.session = FakeSession()
+    def get_headers(self):
+        return {'Authorization': 'Bearer test'}
+
+# -------------------------------------------------------------------------
+# SCENARIO 1: Out-of-band instruments are dropped until the next full scan
+# -------------------------------------------------------------------------
+def test_out_of_band_uics_skipped_between_full_scans():
+    auth = FakeAuth()
+    scanner = MarketScanner(auth, None)
+    scanner.universe_uics = list(range(120))
+
+    scanner.perform_market_scan() # First scan is always full
+    assert len(auth.session.requested) == 120
+
+    auth.session.requested = []
+    scanner.perform_market_scan()
+    assert sorted(auth.session.requested) == list(range(1, 120, 2))
+
+    scanner._last_full_scan -= MarketScanner.FULL_SCAN_INTERVAL
+    auth.session.requested = []
+    scanner.perform_market_scan()
+    assert len(auth.session.requested) == 120
+
+# -------------------------------------------------------------------------
+# SCENARIO 2: A full scan bigger than the rate limit resumes where it stopped
+# -------------------------------------------------------------------------
+def test_rate_limited_full_scan_resumes():
+    auth = FakeAuth()
+    limiter = RateLimiter(limit=2, window=60) # 3 batches per full scan, 2 calls per window
+    scanner = MarketScanner(auth, None, rate_limiter=limiter)
+    scanner.SCAN_WORKERS = 1 # Deterministic batch order
+    scanner.universe_uics = list(range(150))
+
+    scanner.perform_market_scan() # Full: batch 2 is refused
+    assert auth.session.requested == list(range(100))
+
+    limiter.calls.clear()
+    auth.session.requested = []
+    scanner.perform_market_scan() # Banded: never-priced UICs are still scanned
+    assert auth.session.requested == list(range(1, 100, 2)) + list(range(100, 150))
+
+    scanner._last_full_scan -= MarketScanner.FULL_SCAN_INTERVAL
+    limiter.calls.clear()
+    auth.session.requested = []
+    scanner.perform_market_scan() # Full again: starts at batch 2, batch 1 is refused
+    assert auth.session.requested == list(range(100, 150)) + list(range(50))
+    assert scanner._out_of_band == set(range(0, 150, 2)) # Batch 1's classification carried forward
+
+# -------------------------------------------------------------------------
+# SCENARIO 3: A successful batch resets the limiter's 429 backoff
+# -------------------------------------------------------------------------
+class StatusSession(FakeSession):
+    """Answers each GET with the next queued status code (no Retry-After)."""
+    def __init__(self, statuses):
+        super().__init__()
+        self.statuses = list(statuses)
+    def get(self, url, **kwargs):
+        resp = super().get(url, **kwargs)
+        resp.status_code = self.statuses.pop(0)
+        return resp
+
+def test_success_resets_429_backoff():
+    auth = FakeAuth()
+    auth.session = StatusSession([429, 200, 429])
+    limiter = RateLimiter(limit=100, window=60)
+    scanner = MarketScanner(auth, None, rate_limiter=limiter)
+    scanner.universe_uics = list(range(10)) # One batch per scan
+
+    for _ in range(3):
+        limiter.cooldown_until = 0 # Let the next batch through
+        scanner.perform_market_scan()
+
+    # First-step backoff again (1s + jitter), not the doubled second step
+    assert limiter.cooldown_until - time.monotonic() < 2.0
+
+# -------------------------------------------------------------------------
+# SCENARIO 4: Scans are gated to US regular session hours
+# -------------------------------------------------------------------------
+def test_seconds_until_open():
+    zoneinfo = pytest.importorskip("zoneinfo")
+    ny = zoneinfo.ZoneInfo("America/New_York")
+    scanner = MarketScanner(FakeAuth(), None)
+
+    assert scanner.seconds_until_open(datetime(2024, 3, 6, 12, 0, tzinfo=ny)) == 0.0 # Wednesday midday
+    assert scanner.seconds_until_open(datetime(2024, 3, 6, 9, 0, tzinfo=ny)) == 30 * 60 # Pre-open
+    # Friday after the close -> Monday 09:30 is 64.5h on the wall clock, one less across the DST switch (Sun 10 Mar 2024)
+    assert scanner.seconds_until_open(datetime(2024, 3, 8, 17, 0, tzinfo=ny)) == 63.5 * 3600
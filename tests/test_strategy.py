@@ -0,0 +1,89 @@
+import sys
+import os
+import pytest
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from strategy import TrendFollower
+import fast_json
+
+def batch_ema(prices, period):
+    """Reference EMA: SMA seed over the first `period` prices, then one step per price."""
+    ema = sum(prices[:period]) / period
+    k = 2 / (period + 1)
+    for price in prices[period:]:
+        ema = (price * k) + (ema * (1 - k))
+    return ema
+
+@pytest.fixture
+def strategy(monkeypatch):
+    monkeypatch.delenv('REDIS_URL', raising=False) # Stateless: no Redis round trips
+    return TrendFollower(account_manager=None)
+
+# -------------------------------------------------------------------------
+# SCENARIO 1: Streaming EMAs match a full recomputation over the same prices
+# -------------------------------------------------------------------------
+def test_streaming_ema_matches_batch(strategy):
+    prices = [100 + (i % 7) - (i % 3) * 0.5 for i in range(25)]
+    for p in prices:
+        strategy.price_history[211].append(p)
+        strategy._update_emas(211, p)
+
+    assert strategy.short_ema[211] == pytest.approx(batch_ema(prices, strategy.short_period))
+    assert strategy.long_ema[211] == pytest.approx(batch_ema(prices, strategy.long_period))
+
+# -------------------------------------------------------------------------
+# SCENARIO 2: No entry until the long EMA is seeded, then BUY on an uptrend
+# -------------------------------------------------------------------------
+def test_entry_waits_for_long_ema(strategy):
+    signals = [strategy.update(211, 100 + i) for i in range(strategy.long_period)]
+
+    assert signals[:-1] == [None] * (strategy.long_period - 1)
+    assert signals[-1] == 'BUY'
+
+class FakeRedis:
+    """Dict-backed stand-in: str values are plain keys, dict values are hashes (WRONGTYPE enforced)."""
+    def __init__(self, data):
+        self.data = data
+    def scan_iter(self, match):
+        return [k for k in self.data if k.startswith(match.rstrip('*'))]
+    def type(self, key):
+        return b'hash' if isinstance(self.data.get(key), dict) else b'string'
+    def get(self, key):
+        return self.data.get(key)
+    def hgetall(self, key):
+        return self.data.get(key, {})
+    def delete(self, key):
+        self.data.pop(key, None)
+    def hset(self, key, field=None, value=None, mapping=None):
+        if isinstance(self.data.get(key), str):
+            raise Exception("WRONGTYPE Operation against a key holding the wrong kind of value")
+        h = self.data.setdefault(key, {})
+        h.update(mapping or {field: value})
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client, self.calls = client, []
+    def __getattr__(self, name):
+        return lambda *a, **kw: self.calls.append((getattr(self.client, name), a, kw))
+    def execute(self):
+        return [fn(*a, **kw) for fn, a, kw in self.calls]
+
+# -------------------------------------------------------------------------
+# SCENARIO 3: A legacy JSON-string position is rewritten as a Hash on load
+# -------------------------------------------------------------------------
+def test_legacy_position_migrated_on_load():
+    key = TrendFollower.POSITION_KEY.format(211)
+    client = FakeRedis({key: '{"uic": 211, "entry_price": 10.0, "quantity": 5, "max_price": 11.0}'})
+    strategy = TrendFollower(account_manager=None, redis_client=client)
+
+    assert strategy.active_positions[211]['qty'] == 5
+    assert isinstance(client.data[key], dict)
+
+    strategy.active_positions[211]['peak_price'] = 12.0
+    strategy._save_state(211, field='peak_price') # Single-field HSET now lands
+    assert fast_json.loads(client.data[key]['peak_price']) == 12.0
+    assert strategy._saved_peak[211] == 12.0